@@ -6,14 +6,17 @@ from selenium.webdriver import Chrome, ChromeOptions, Firefox, FirefoxOptions
 from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import WebDriverException, TimeoutException
-from time import sleep
-import subprocess
+from time import monotonic
+from contextlib import contextmanager
+import sys
 import re
 import json
 import os
+from array import array
+from itertools import islice
+from urllib.parse import urlparse
 
 # Import yt_dlp if available, otherwise define a simple fallback
 try:
@@ -21,6 +24,10 @@ try:
 except ImportError:
     YoutubeDL = None
 
+# Site root of every URL the driver builds; EYT_YOUTUBE_URL points it at another
+# server (e.g. the local fixture of examples/mock_youtube.py)
+YOUTUBE_URL = os.environ.get('EYT_YOUTUBE_URL', 'https://www.youtube.com').rstrip('/')
+
 # ========================================
 # UTILITY CLASSES
 # ========================================
@@ -30,49 +37,571 @@ class VideoUnavailableException(Exception):
     pass
 
 class VideoMetadata:
-    """Video metadata extracted via yt-dlp."""
-    def __init__(self, video_json):
-        self.id = video_json.get('id', '')
-        self.title = video_json.get('title', '')
-        self.webpage_url = video_json.get('webpage_url', '')
-        self.duration = video_json.get('duration', 0)
-        self.thumbnail = video_json.get('thumbnail', '')
-        self.description = video_json.get('description', '')
-        self.upload_date = video_json.get('upload_date', '')
-        self.channel_id = video_json.get('channel_id', '')
-        self.channel_url = video_json.get('channel_url', '')
-        self.age_limit = video_json.get('age_limit', 0)
-        self.channel_name = video_json.get('uploader', '')
-        self.view_count = video_json.get('view_count', 0)
-        self.like_count = video_json.get('like_count', 0)
-        self.comment_count = video_json.get('comment_count', 0)
-        self.average_rating = video_json.get('average_rating', 0)
-        self.categories = video_json.get('categories', [])
-        self.tags = video_json.get('tags', [])
-        self.video_json = video_json
+    """
+    Video metadata extracted via yt-dlp (immutable, slotted record).
+
+    The raw yt-dlp dict is only kept when keep_json=True; it holds hundreds of
+    fields (formats, thumbnails...) and dominates memory otherwise.
+    """
+    # (attribute, yt-dlp key, default)
+    FIELDS = (
+        ('id', 'id', ''),
+        ('title', 'title', ''),
+        ('webpage_url', 'webpage_url', ''),
+        ('duration', 'duration', 0),
+        ('thumbnail', 'thumbnail', ''),
+        ('description', 'description', ''),
+        ('upload_date', 'upload_date', ''),
+        ('channel_id', 'channel_id', ''),
+        ('channel_url', 'channel_url', ''),
+        ('age_limit', 'age_limit', 0),
+        ('channel_name', 'uploader', ''),
+        ('view_count', 'view_count', 0),
+        ('like_count', 'like_count', 0),
+        ('comment_count', 'comment_count', 0),
+        ('average_rating', 'average_rating', 0),
+        ('categories', 'categories', ()),
+        ('tags', 'tags', ()),
+    )
+    __slots__ = tuple(attribute for attribute, _, _ in FIELDS) + ('video_json',)
+
+    def __init__(self, video_json, keep_json=False):
+        for attribute, key, default in self.FIELDS:
+            value = video_json.get(key, default)
+            if isinstance(value, list):
+                value = tuple(value)
+            object.__setattr__(self, attribute, value)
+        object.__setattr__(self, 'video_json', video_json if keep_json else None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"VideoMetadata(id={self.id!r}, title={self.title!r})"
+
+    def as_dict(self):
+        """Fields by attribute name."""
+        return {attribute: getattr(self, attribute) for attribute, _, _ in self.FIELDS}
+
+    def to_json(self):
+        """The yt-dlp fields this class reads (VideoMetadata(m.to_json()) is equivalent to m, minus video_json)."""
+        return {key: list(getattr(self, attribute)) if isinstance(getattr(self, attribute), tuple) else getattr(self, attribute)
+                for attribute, key, _ in self.FIELDS}
+
+# Video id in a watch URL
+VIDEO_ID_RE = re.compile(r'[?&]v=(.*?)(?:&|$)')
 
 class Video:
     """Class to encapsulate a YouTube video."""
+
+    __slots__ = ('__elem', '__elem_resolver', '__metadata', 'url', 'title', 'channel', 'duration', 'rank', 'videoId')
     
     YT_DLP = YoutubeDL(dict(quiet=True)) if YoutubeDL else None
+    # Shared MetadataCache (see metadata_cache.py) consulted before yt-dlp, if set
+    METADATA_CACHE = None
     
-    def __init__(self, elem, url):
-        self.elem = elem
+    def __init__(self, elem, url, title='', channel='', duration='', rank=None, elem_resolver=None):
+        self.__elem = elem
+        # Called on first access to `elem` when the video was extracted by script
+        self.__elem_resolver = elem_resolver
         self.url = url
+        self.title = title
+        self.channel = channel
+        self.duration = duration
+        self.rank = rank
         # Extract video ID from URL
-        match = re.search(r'[?&]v=(.*?)(?:&|$)', url)
-        self.videoId = match.group(1) if match else ''
+        match = VIDEO_ID_RE.search(url)
+        # Interned: the same ids recur across thousands of recommendation lists
+        self.videoId = sys.intern(match.group(1)) if match else ''
         self.__metadata = None
 
+    @property
+    def elem(self):
+        """WebElement to click, looked up lazily for script-extracted videos."""
+        if self.__elem is None and self.__elem_resolver:
+            try:
+                self.__elem = self.__elem_resolver()
+            except WebDriverException:
+                self.__elem = None
+            self.__elem_resolver = None
+        return self.__elem
+
     def get_metadata(self):
-        """Retrieve metadata via yt-dlp."""
-        if not self.__metadata and self.YT_DLP:
+        """Retrieve metadata via yt-dlp (fetched once, then cached). None if unavailable."""
+        if self.__metadata is None and Video.METADATA_CACHE is not None:
+            self.__metadata = Video.METADATA_CACHE.get(self.videoId)
+        if self.__metadata is None and self.YT_DLP:
             try:
-                self.__metadata = Video.YT_DLP.extract_info(self.url, download=False)
-                return VideoMetadata(self.__metadata)
-            except:
-                pass
+                self.__metadata = VideoMetadata(Video.YT_DLP.extract_info(self.url, download=False))
+                if Video.METADATA_CACHE is not None:
+                    Video.METADATA_CACHE.put(self.__metadata)
+            except Exception:
+                # yt-dlp raises DownloadError for private/deleted videos; see metadata_enrichment for batches
+                return None
+        return self.__metadata
+
+class VideoBatch:
+    """
+    Array-backed list of (video id, rank) references, for aggregating many
+    recommendation/search records without one object per record.
+
+    Ids are stored as integer codes into a vocabulary shared by the batch.
+    """
+    __slots__ = ('codes', 'ranks', 'vocabulary', '__index')
+
+    def __init__(self, videos=()):
+        self.codes = array('I')
+        # 0 = no rank
+        self.ranks = array('H')
+        self.vocabulary = []
+        self.__index = {}
+        for video in videos:
+            self.append(video.videoId, video.rank or 0)
+
+    def append(self, video_id, rank=0):
+        code = self.__index.get(video_id)
+        if code is None:
+            code = self.__index[video_id] = len(self.vocabulary)
+            self.vocabulary.append(video_id)
+        self.codes.append(code)
+        self.ranks.append(rank)
+
+    def extend(self, video_ids, start_rank=1):
+        """Append a ranked list of ids (e.g. one recommendation list)."""
+        for rank, video_id in enumerate(video_ids, start=start_rank):
+            self.append(video_id, rank)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.vocabulary[self.codes[i]], self.ranks[i]
+
+    def __iter__(self):
+        for code, rank in zip(self.codes, self.ranks):
+            yield self.vocabulary[code], rank
+
+    def video_ids(self):
+        return [self.vocabulary[code] for code in self.codes]
+
+# ========================================
+# PAGE DATA
+# ========================================
+# Parsing of YouTube's internal page data (ytInitialData) and URLs.
+
+def channel_url(handle):
+    """URL of a channel from its @handle (with or without the @)."""
+    if not handle.startswith('@'):
+        handle = '@' + handle
+    return f'{YOUTUBE_URL}/{handle}'
+
+def page_type(url):
+    """Kind of YouTube page a URL points to (labels page load stats)."""
+    path = urlparse(url).path
+    if path.startswith('/watch'):
+        return 'watch'
+    if path.startswith('/results'):
+        return 'search'
+    if path.startswith(('/@', '/channel/', '/c/', '/user/')):
+        return 'channel'
+    if path in ('', '/'):
+        return 'home'
+    return 'other'
+
+
+def _text(value):
+    """Text of a YouTube text object ({'simpleText'}, {'runs'} or {'content'})."""
+    if not isinstance(value, dict):
+        return value if isinstance(value, str) else ''
+    if 'simpleText' in value:
+        return value['simpleText']
+    if 'runs' in value:
+        return ''.join(run.get('text', '') for run in value['runs'])
+    return value.get('content', '')
+
+def _find_key(value, key):
+    """First value stored under `key` anywhere in a JSON tree (depth first)."""
+    if isinstance(value, dict):
+        if key in value:
+            return value[key]
+        value = list(value.values())
+    if isinstance(value, list):
+        for item in value:
+            found = _find_key(item, key)
+            if found is not None:
+                return found
+    return None
+
+def _video_renderer(renderer):
+    """(videoId, title, channel, duration) of a videoRenderer-like dict."""
+    channel = renderer.get('ownerText') or renderer.get('longBylineText') or renderer.get('shortBylineText')
+    return renderer.get('videoId'), _text(renderer.get('title')), _text(channel), _text(renderer.get('lengthText'))
+
+def _lockup_view_model(lockup):
+    """(videoId, title, channel, duration) of a lockupViewModel, None for playlists/mixes."""
+    if lockup.get('contentType') != 'LOCKUP_CONTENT_TYPE_VIDEO':
         return None
+    metadata = (lockup.get('metadata') or {}).get('lockupMetadataViewModel') or {}
+    rows = _find_key(metadata.get('metadata'), 'metadataRows') or []
+    parts = rows[0].get('metadataParts', []) if rows else []
+    badge = _find_key(lockup.get('contentImage'), 'thumbnailBadgeViewModel') or {}
+    return lockup.get('contentId'), _text(metadata.get('title')), _text(parts[0].get('text')) if parts else '', badge.get('text', '')
+
+VIDEO_RENDERERS = {
+    'videoRenderer': _video_renderer,
+    'compactVideoRenderer': _video_renderer,
+    'gridVideoRenderer': _video_renderer,
+    'lockupViewModel': _lockup_view_model,
+}
+# Promoted content is not part of the organic results
+SKIPPED_RENDERERS = {'adSlotRenderer', 'promotedSparklesWebRenderer', 'searchPyvRenderer', 'promotedVideoRenderer'}
+
+def parse_video_list(data, limit=None):
+    """
+    Ranked videos found in a section of ytInitialData (search results, up next...),
+    in page order: [{'videoId', 'title', 'channel', 'duration', 'rank'}].
+    """
+    videos = []
+    stack = [data]
+    while stack and (limit is None or len(videos) < limit):
+        value = stack.pop()
+        if isinstance(value, list):
+            stack.extend(reversed(value))
+            continue
+        if not isinstance(value, dict):
+            continue
+        children = []
+        for key, child in value.items():
+            if key in SKIPPED_RENDERERS:
+                continue
+            if key in VIDEO_RENDERERS and isinstance(child, dict):
+                video = VIDEO_RENDERERS[key](child)
+                if video and video[0]:
+                    video_id, title, channel, duration = video
+                    videos.append(dict(videoId=video_id, title=title, channel=channel, duration=duration, rank=len(videos) + 1))
+            elif isinstance(child, (dict, list)):
+                children.append(child)
+        stack.extend(reversed(children))
+    return videos
+
+# ========================================
+# READINESS CONDITIONS
+# ========================================
+# Callables usable with WebDriverWait.until(), replacing fixed sleep() calls.
+
+class document_ready:
+    """The document has finished loading (readyState == 'complete')."""
+    def __call__(self, driver):
+        return driver.execute_script("return document.readyState") == 'complete'
+
+class more_results_loaded:
+    """
+    More than `count` elements match `css_selector`, or the page has nothing more
+    to load (no continuation item). Returns (count, more_pending).
+    """
+    def __init__(self, css_selector, count):
+        self.css_selector = css_selector
+        self.count = count
+
+    def __call__(self, driver):
+        loaded, pending = driver.execute_script(
+            "return [document.querySelectorAll(arguments[0]).length, !!document.querySelector('ytd-continuation-item-renderer')];",
+            self.css_selector)
+        if loaded > self.count or not pending:
+            return loaded, pending
+        return False
+
+class element_count_stable:
+    """At least `min_count` elements match `locator` and the count is unchanged for `stable_time` seconds."""
+    def __init__(self, locator, min_count=1, stable_time=0.5):
+        self.locator = locator
+        self.min_count = min_count
+        self.stable_time = stable_time
+        self.last_count = None
+        self.since = monotonic()
+
+    def __call__(self, driver):
+        elements = driver.find_elements(*self.locator)
+        now = monotonic()
+        if len(elements) != self.last_count:
+            self.last_count = len(elements)
+            self.since = now
+            return False
+        if len(elements) >= self.min_count and now - self.since >= self.stable_time:
+            return elements
+        return False
+
+# ========================================
+# SCRIPT EXTRACTION
+# ========================================
+# Video lists are read with a single execute_script call instead of one
+# find_element + get_attribute round trip per renderer.
+
+EXTRACT_VIDEOS_JS = """
+const [containerSel, linkSel, limit, start] = arguments;
+const text = (root, sels) => {
+    for (const sel of sels) {
+        const e = root.querySelector(sel);
+        if (e && e.textContent.trim()) return e.textContent.trim();
+    }
+    return '';
+};
+const out = [];
+const nodes = document.querySelectorAll(containerSel);
+for (let i = start || 0; i < nodes.length; i++) {
+    if (limit !== null && out.length >= limit) break;
+    const link = nodes[i].querySelector(linkSel);
+    if (!link || !link.href || !link.href.includes('/watch?v=')) continue;
+    out.push({
+        index: i,
+        href: link.href,
+        title: link.getAttribute('title') || text(nodes[i], ['#video-title', 'h3', '.yt-lockup-metadata-view-model__title']),
+        channel: text(nodes[i], ['ytd-channel-name a', '#channel-name a', '#channel-name', '.yt-content-metadata-view-model__metadata-text']),
+        duration: text(nodes[i], ['ytd-thumbnail-overlay-time-status-renderer #text', '.yt-badge-shape__text', '.badge-shape-wiz__text']),
+        rank: out.length + 1
+    });
+}
+return out;
+"""
+
+COUNT_JS = "return document.querySelectorAll(arguments[0]).length;"
+
+RESOLVE_VIDEO_ELEM_JS = """
+const [containerSel, linkSel, index, href] = arguments;
+const node = document.querySelectorAll(containerSel)[index];
+const link = node ? node.querySelector(linkSel) : null;
+return link && link.href === href ? link : null;
+"""
+
+# Page data of the current page: window.ytInitialData is only set on full page
+# loads, after in-app navigation the app elements hold the latest response.
+# Only the requested section is serialized (as a string, much faster to transfer).
+INITIAL_DATA_JS = """
+const [section] = arguments;
+let response = null;
+const manager = document.querySelector('ytd-page-manager');
+if (manager && manager.getCurrentData) {
+    const current = manager.getCurrentData();
+    response = current && current.response;
+}
+if (!response) {
+    const app = document.querySelector('ytd-app');
+    response = app && app.data && app.data.response;
+}
+response = response || window.ytInitialData;
+if (!response || !response.contents) return null;
+const contents = response.contents;
+let data = contents;
+if (section === 'search') {
+    data = contents.twoColumnSearchResultsRenderer && contents.twoColumnSearchResultsRenderer.primaryContents;
+} else if (section === 'watch_next') {
+    data = contents.twoColumnWatchNextResults && contents.twoColumnWatchNextResults.secondaryResults;
+}
+const endpoint = response.currentVideoEndpoint && response.currentVideoEndpoint.watchEndpoint;
+return {videoId: endpoint ? endpoint.videoId : null, data: data ? JSON.stringify(data) : null};
+"""
+
+PLAYER_DETAILS_JS = """
+const player = document.querySelector('#movie_player');
+const response = (player && player.getPlayerResponse && player.getPlayerResponse()) || window.ytInitialPlayerResponse;
+return response && response.videoDetails ? JSON.stringify(response.videoDetails) : null;
+"""
+
+RESOLVE_VIDEO_BY_ID_JS = """
+const [containerSel, videoId] = arguments;
+for (const container of document.querySelectorAll(containerSel)) {
+    for (const link of container.querySelectorAll('a[href*="/watch?v="]')) {
+        if (new URL(link.href).searchParams.get('v') === videoId) return link;
+    }
+}
+return null;
+"""
+
+# Ad detection: a MutationObserver on the player tracks the 'ad-showing' class
+# (ad count and time for the current watch) and wakes up waiting scripts.
+# Called with reset=true at the start of each watch to reset the counters.
+AD_OBSERVER_JS = """
+const [reset] = arguments;
+const player = document.querySelector('#movie_player');
+if (!player) return false;
+if (!player.__eytAds) {
+    const state = player.__eytAds = {showing: false, since: 0, seconds: 0, ads: 0, listeners: []};
+    const update = () => {
+        const showing = player.classList.contains('ad-showing');
+        const now = performance.now();
+        if (showing && !state.showing) { state.ads++; state.since = now; }
+        if (!showing && state.showing) state.seconds += (now - state.since) / 1000;
+        state.showing = showing;
+        const listeners = state.listeners;
+        state.listeners = [];
+        listeners.forEach(listener => listener());
+    };
+    // Skip buttons appear through class/style changes deeper in the player
+    new MutationObserver(update).observe(player, {attributes: true, attributeFilter: ['class', 'style'], subtree: true, childList: true});
+    update();
+}
+const state = player.__eytAds;
+if (reset) {
+    state.seconds = 0;
+    state.ads = state.showing ? 1 : 0;
+    state.since = performance.now();
+}
+return true;
+"""
+
+# Accumulates the content time actually played (not during ads, pauses or seeks)
+# and resolves when `target` seconds are reached, the video ends, an ad starts,
+# playback stays paused (after one attempt to resume it) or after `timeoutMs`.
+# Keeps the content at `rate` (the player resets it, e.g. after ads); `playing`
+# is the wall time spent playing content.
+WATCH_PROGRESS_JS = """
+const [target, timeoutMs, rate] = arguments;
+const done = arguments[arguments.length - 1];
+const player = document.querySelector('#movie_player');
+const video = player && player.querySelector('video');
+if (!video) return done({status: 'no_player', watched: 0, playing: 0});
+const start = performance.now();
+let watched = 0;
+let playing = 0;
+let lastTick = start;
+let last = video.currentTime;
+let pausedSince = null;
+let resumed = false;
+const timer = setInterval(() => {
+    const now = performance.now();
+    const ad = player.classList.contains('ad-showing');
+    const time = video.currentTime;
+    if (!ad && !video.paused) {
+        // Larger jumps are seeks or the switch between ad and video
+        if (time > last && time - last < 2 * Math.max(rate, 1)) watched += time - last;
+        playing += (now - lastTick) / 1000;
+        if (video.playbackRate !== rate) video.playbackRate = rate;
+    }
+    last = time;
+    lastTick = now;
+    let status = null;
+    if (watched >= target) status = 'reached';
+    else if (video.ended) status = 'ended';
+    else if (ad) status = 'ad';
+    else if (video.paused) {
+        pausedSince = pausedSince || now;
+        if (!resumed && now - pausedSince > 1000) {
+            resumed = true;
+            player.playVideo ? player.playVideo() : video.play();
+        }
+        if (now - pausedSince > 3000) status = 'paused';
+    } else {
+        pausedSince = null;
+    }
+    if (!status && now - start > timeoutMs) status = 'timeout';
+    if (status) {
+        clearInterval(timer);
+        done({status: status, watched: watched, playing: playing});
+    }
+}, 250);
+"""
+
+# Resolves once no ad is showing, a skip button is displayed (if `skip`), or after the timeout (ms)
+WAIT_AD_EVENT_JS = """
+const [timeoutMs, skip] = arguments;
+const done = arguments[arguments.length - 1];
+const player = document.querySelector('#movie_player');
+const state = player && player.__eytAds;
+if (!state) return done({showing: false});
+const skipButton = () => {
+    for (const button of player.querySelectorAll('.ytp-skip-ad-button, .ytp-ad-skip-button, .ytp-ad-skip-button-modern')) {
+        if (button.offsetParent !== null) return button;
+    }
+    return null;
+};
+const check = () => {
+    if (!state.showing) return {showing: false};
+    const button = skip && skipButton();
+    return button ? {showing: true, skip: button} : null;
+};
+let finished = false;
+const finish = result => { if (!finished) { finished = true; done(result); } };
+const listen = () => {
+    if (finished) return;
+    const result = check();
+    if (result) finish(result); else state.listeners.push(listen);
+};
+setTimeout(() => finish({showing: state.showing, timeout: true}), timeoutMs);
+listen();
+"""
+
+# Resolves true once a clicked skip button took effect (the ad ended, the next ad
+# started or the button was hidden), false if it is still shown after the timeout (ms)
+WAIT_AD_SKIPPED_JS = """
+const [button, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const player = document.querySelector('#movie_player');
+const state = player && player.__eytAds;
+if (!state) return done(true);
+const ads = state.ads;
+const skipped = () => !state.showing || state.ads !== ads || !button.isConnected || button.offsetParent === null;
+let finished = false;
+const finish = result => { if (!finished) { finished = true; done(result); } };
+const listen = () => {
+    if (finished) return;
+    if (skipped()) finish(true); else state.listeners.push(listen);
+};
+setTimeout(() => finish(skipped()), timeoutMs);
+listen();
+"""
+
+SEEK_JS = """
+const player = document.querySelector('#movie_player');
+if (player && player.seekTo) player.seekTo(arguments[0], true);
+else if (player && player.querySelector('video')) player.querySelector('video').currentTime = arguments[0];
+"""
+
+AD_STATS_JS = """
+const player = document.querySelector('#movie_player');
+const state = player && player.__eytAds;
+if (!state) return null;
+const ongoing = state.showing ? (performance.now() - state.since) / 1000 : 0;
+return {ads: state.ads, seconds: state.seconds + ongoing};
+"""
+
+# Requests dropped by default (Network.setBlockedURLs patterns, '*' is a wildcard):
+# thumbnails, avatars, fonts and third-party analytics. Player, youtubei
+# (browse/next/search/player), googlevideo streams, /api/stats watch-time pings
+# and ads are kept, since they shape watch history and what the audit observes.
+DEFAULT_BLOCKED_URLS = [
+    '*://i.ytimg.com/vi/*',
+    '*://i.ytimg.com/an_webp/*',
+    '*://i9.ytimg.com/*',
+    '*://yt3.ggpht.com/*',
+    '*://yt3.googleusercontent.com/*',
+    '*://fonts.gstatic.com/*',
+    '*://fonts.googleapis.com/*',
+    '*.woff2',
+    '*.woff',
+    '*://www.google-analytics.com/*',
+    '*://www.googletagmanager.com/*',
+    '*://play.google.com/log*',
+]
+
+# GDPR consent dialog (in-page lightbox or consent.youtube.com redirect) and its accept button
+CONSENT_DIALOG = (By.CSS_SELECTOR, 'ytd-consent-bump-v2-lightbox, form[action*="consent.youtube.com"]')
+CONSENT_ACCEPT = (By.XPATH, "//button[.//span[contains(text(), 'Accept all') or contains(text(), 'Tout accepter') or contains(text(), 'Accepter')]]")
+
+# Resource timings since the previous call (then cleared), plus navigation timings
+PAGE_LOAD_STATS_JS = """
+const nav = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+let bytes = 0;
+for (const r of resources) bytes += r.transferSize || 0;
+performance.clearResourceTimings();
+performance.setResourceTimingBufferSize(5000);
+return {
+    dom_content_loaded: nav ? nav.domContentLoadedEventEnd / 1000 : null,
+    load_event: nav ? nav.loadEventEnd / 1000 : null,
+    resources: resources.length,
+    transfer_kb: bytes / 1024
+};
+"""
 
 # ========================================
 # MAIN CLASS
@@ -84,7 +613,8 @@ class EYTDriver:
     No more dependency on obsolete ytdriver package!
     """
     
-    def __init__(self, browser='chrome', profile_dir=None, use_virtual_display=False, headless=False, verbose=False):
+    def __init__(self, browser='chrome', profile_dir=None, use_virtual_display=False, headless=False, verbose=False, unique_profile=True,
+                 blocked_urls=DEFAULT_BLOCKED_URLS, extraction='dom'):
         """
         Autonomous driver initialization
         
@@ -94,8 +624,21 @@ class EYTDriver:
             use_virtual_display: Virtual display Linux
             headless: Headless mode
             verbose: Detailed logs
+            unique_profile: Add a unique suffix to profile_dir (False to reuse a persistent profile as is)
+            blocked_urls: URL patterns not loaded (Chrome only); empty for full page loads
+            extraction: 'dom' to scrape rendered results, 'json' to read YouTube's page data (ytInitialData)
         """
         self.verbose = verbose
+        # Wall-clock duration of each navigation/wait step: [{'step': ..., 'seconds': ...}]
+        self.step_timings = []
+        # Actual user-data-dir used by the browser (None for a temporary profile)
+        self.profile_dir = None
+        # One entry per page load: [{'page': ..., 'url': ..., 'seconds': ..., 'resources': ..., ...}]
+        self.page_loads = []
+        self.blocked_urls = []
+        self.extraction = extraction
+        # Set once consent was given in this browser: no dialog is looked for after that
+        self.consent_given = False
         
         # Virtual display if requested (Linux)
         if use_virtual_display:
@@ -108,16 +651,20 @@ class EYTDriver:
                 self.__log("pyvirtualdisplay not available")
         
         # Driver initialization
-        if browser == 'chrome':
-            self.driver = self.__init_chrome(profile_dir, headless)
-        elif browser == 'firefox':
-            self.driver = self.__init_firefox(profile_dir, headless)
-        else:
-            raise Exception("Invalid browser", browser)
+        with self.__timed('browser_start'):
+            if browser == 'chrome':
+                self.driver = self.__init_chrome(profile_dir, headless, unique_profile)
+            elif browser == 'firefox':
+                self.driver = self.__init_firefox(profile_dir, headless)
+            else:
+                raise Exception("Invalid browser", browser)
+        self.startup_seconds = self.step_timings[-1]['seconds']
         
         self.driver.set_page_load_timeout(30)
+        if blocked_urls:
+            self.block_resources(blocked_urls)
 
-    def __init_chrome(self, profile_dir, headless):
+    def __init_chrome(self, profile_dir, headless, unique_profile=True):
         """Chrome initialization with optimized options."""
         options = ChromeOptions()
         # Essential Docker options
@@ -125,9 +672,12 @@ class EYTDriver:
         options.add_argument('--disable-dev-shm-usage')
         options.add_argument('--disable-gpu')
         
-        # Generate unique remote debugging port per container
+        # Pick a free remote debugging port so several browsers can share a container
         import random
-        debug_port = 9222 + random.randint(1, 100)
+        import socket
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            debug_port = sock.getsockname()[1]
         options.add_argument(f'--remote-debugging-port={debug_port}')
         
         options.add_argument('--window-size=1920,1080')
@@ -154,12 +704,17 @@ class EYTDriver:
         if os.path.exists('/.dockerenv') or headless:
             options.add_argument('--headless')
         
-        if profile_dir:
+        if profile_dir and not unique_profile:
+            options.add_argument(f'--user-data-dir={profile_dir}')
+            self.profile_dir = profile_dir
+            self.__log(f"Using profile directory: {profile_dir}")
+        elif profile_dir:
             # Ensure unique profile directory per container to avoid conflicts
             import time
             unique_suffix = f"{int(time.time())}{random.randint(1000, 9999)}"
             unique_profile_dir = f"{profile_dir}_{unique_suffix}"
             options.add_argument(f'--user-data-dir={unique_profile_dir}')
+            self.profile_dir = unique_profile_dir
             self.__log(f"Using unique profile directory: {unique_profile_dir}")
         
         driver = Chrome(options=options)
@@ -183,50 +738,270 @@ class EYTDriver:
         """Close the driver."""
         self.driver.close()
 
+    def quit(self):
+        """Quit the browser process and its driver."""
+        try:
+            self.driver.quit()
+        except WebDriverException as e:
+            self.__log(f"Error quitting driver: {e}")
+
+    def block_resources(self, blocked_urls):
+        """
+        Stop loading requests whose URL matches one of the patterns ('*' wildcard).
+        Takes effect for the following requests; an empty list restores full page loads.
+        """
+        if not isinstance(self.driver, Chrome):
+            self.__log("Resource blocking is only supported with Chrome")
+            return
+        self.driver.execute_cdp_cmd('Network.enable', {})
+        self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(blocked_urls)})
+        self.blocked_urls = list(blocked_urls)
+        self.__log(f"Blocking {len(self.blocked_urls)} URL patterns" if blocked_urls else "Full page loads")
+
+    def __record_page_load(self, page, seconds, navigation=True):
+        """
+        Append load time and resource count/size of the current page to self.page_loads.
+        Navigation timings are only meaningful after a full navigation (not in-app clicks).
+        """
+        record = dict(page=page, url=self.driver.current_url, seconds=round(seconds, 3))
+        try:
+            stats = self.driver.execute_script(PAGE_LOAD_STATS_JS) or {}
+        except WebDriverException as e:
+            self.__log(f"Could not read page load stats: {e}")
+            stats = {}
+        if not navigation:
+            stats.pop('dom_content_loaded', None)
+            stats.pop('load_event', None)
+        record.update({key: round(value, 3) if isinstance(value, float) else value for key, value in stats.items()})
+        self.page_loads.append(record)
+
     def __log(self, message):
         """Conditional logging."""
         if self.verbose:
             print(message)
 
+    @contextmanager
+    def __timed(self, step):
+        """Record the wall-clock duration of a step in self.step_timings."""
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self.step_timings.append(dict(step=step, seconds=round(monotonic() - start, 3)))
+
+    def extract_videos(self, container_selector, link_selector='a[href*="/watch?v="]', limit=None, start=0):
+        """
+        Extract id, href, title, channel, duration and rank of every renderer
+        matching `container_selector` in one script call (from the `start`-th one,
+        ranks then count from there).
+
+        The returned Video objects hold no WebElement; it is resolved on demand
+        when `video.elem` is accessed (e.g. to click it).
+        """
+        return [video for _, video in self.__extract_indexed(container_selector, link_selector, limit, start)]
+
+    def __extract_indexed(self, container_selector, link_selector, limit=None, start=0):
+        """(renderer index, Video) pairs of extract_videos."""
+        records = self.driver.execute_script(EXTRACT_VIDEOS_JS, container_selector, link_selector, limit, start) or []
+        videos = []
+        for record in records:
+            resolver = (lambda index=record['index'], href=record['href']: self.driver.execute_script(
+                RESOLVE_VIDEO_ELEM_JS, container_selector, link_selector, index, href))
+            videos.append((record['index'], Video(None, record['href'], title=record['title'], channel=record['channel'],
+                                                  duration=record['duration'], rank=record['rank'], elem_resolver=resolver)))
+        return videos
+
+    def iter_videos(self, container_selector, link_selector='a[href*="/watch?v="]', step='scroll', max_scrolls=50, timeout=5):
+        """
+        Yield the unique videos of an infinite-scroll page (search results,
+        homepage) in page order, scrolling for more only once the loaded ones
+        are consumed. Stops when the page has no more results, or when no new
+        renderer arrives within `timeout` after a scroll.
+        Ranks count unique videos; `step` names the scroll timings.
+        """
+        seen = set()
+        start = 0
+        for scroll in range(max_scrolls + 1):
+            for index, video in self.__extract_indexed(container_selector, link_selector, start=start):
+                # Renderers still empty (no link yet) are read again after the next scroll
+                start = index + 1
+                if video.videoId in seen:
+                    continue
+                seen.add(video.videoId)
+                video.rank = len(seen)
+                yield video
+            if scroll == max_scrolls:
+                break
+            loaded = self.driver.execute_script(COUNT_JS, container_selector)
+            with self.__timed(step):
+                self.driver.execute_script('window.scrollTo(0, document.documentElement.scrollHeight);')
+                more = self.wait_for(more_results_loaded(container_selector, loaded), timeout=timeout)
+            if not more or more[0] <= loaded:
+                self.__log(f"No more results after {len(seen)} videos")
+                break
+
+    def extract_page_data(self, section, container_selector, limit=None, video_id=None, timeout=10):
+        """
+        Videos of a section of the page data ('search' or 'watch_next') in one
+        script call, without waiting for them to render.
+
+        `video_id` waits until the data belongs to that watch page (it lags
+        behind the URL after in-app navigation). Returns [] if unavailable.
+        Elements are resolved on demand within `container_selector`.
+        """
+        def current_data(driver):
+            page = driver.execute_script(INITIAL_DATA_JS, section)
+            if not page or not page['data'] or (video_id and page['videoId'] != video_id):
+                return False
+            return page
+
+        page = self.wait_for(current_data, timeout=timeout)
+        if not page:
+            return []
+        videos = []
+        for record in parse_video_list(json.loads(page['data']), limit):
+            resolver = (lambda video_id=record['videoId']: self.driver.execute_script(
+                RESOLVE_VIDEO_BY_ID_JS, container_selector, video_id))
+            videos.append(Video(None, f"{YOUTUBE_URL}/watch?v={record['videoId']}", title=record['title'],
+                                channel=record['channel'], duration=record['duration'], rank=record['rank'],
+                                elem_resolver=resolver))
+        return videos
+
+    def current_video_details(self):
+        """videoDetails of the player response (videoId, title, author, channelId, lengthSeconds...), or None."""
+        details = self.driver.execute_script(PLAYER_DETAILS_JS)
+        return json.loads(details) if details else None
+
+    def wait_for(self, condition, timeout=10, poll_frequency=0.1):
+        """
+        Block until a readiness condition holds instead of sleeping a fixed time.
+
+        Returns the condition's value, or None if it did not hold within `timeout`.
+        """
+        try:
+            return WebDriverWait(self.driver, timeout, poll_frequency=poll_frequency).until(condition)
+        except TimeoutException:
+            name = getattr(condition, '__name__', type(condition).__name__)
+            self.__log(f"Timed out after {timeout}s waiting for {name}")
+            return None
+
     # ========================================
     # ADDED METHODS (new)
     # ========================================
 
-    def handle_consent(self):
-        """Automatic handling of European GDPR popups."""
+    def handle_consent(self, timeout=1):
+        """Automatic handling of European GDPR popups, until consent is given in this browser."""
+        if self.consent_given:
+            return
+        try:
+            # A persistent profile may already hold the choice
+            socs, consent = self.driver.get_cookie('SOCS'), self.driver.get_cookie('CONSENT')
+            if socs or (consent and consent['value'].startswith('YES')):
+                self.consent_given = True
+                return
+            # The dialog is in the page (or the redirect) by the time it has loaded
+            WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(EC.presence_of_element_located(CONSENT_DIALOG))
+        except TimeoutException:
+            self.__log("No consent popup detected.")
+            return
+        except Exception as e:
+            self.__log(f"Error handling consent: {e}")
+            return
         try:
-            wait = WebDriverWait(self.driver, 2)
-            consent_button = wait.until(EC.element_to_be_clickable((
-                By.XPATH,
-                "//button[.//span[contains(text(), 'Accept all') or contains(text(), 'Tout accepter') or contains(text(), 'Accepter')]]"
-            )))
+            consent_button = WebDriverWait(self.driver, 5, poll_frequency=0.1).until(EC.element_to_be_clickable(CONSENT_ACCEPT))
             consent_button.click()
+            self.consent_given = True
             self.__log("GDPR consent accepted.")
-            sleep(2)
+            with self.__timed('consent'):
+                self.wait_for(EC.staleness_of(consent_button), timeout=5)
+                self.wait_for(document_ready(), timeout=10)
         except TimeoutException:
-            self.__log("No consent popup detected.")
+            self.__log("Consent popup without an accept button.")
         except Exception as e:
             self.__log(f"Error handling consent: {e}")
 
     def get(self, url):
         """Navigation with automatic GDPR handling."""
+        start = monotonic()
         self.driver.get(url)
         self.handle_consent()
+        self.__record_page_load(page_type(url), monotonic() - start)
 
     def go_to_channel_from_handle(self, handle):
         """Navigate to channel via @handle."""
-        if not handle.startswith('@'):
-            handle = '@' + handle
-        url = f'https://www.youtube.com/{handle}'
+        url = channel_url(handle)
         self.__log(f"Going to channel: {url}")
         self.get(url)
-        sleep(2)
+        with self.__timed('channel_load'):
+            self.wait_for(document_ready(), timeout=10)
 
     def watch_top_video(self):
         """Retrieve popular videos from a channel."""
-        self.driver.get(self.driver.current_url + "/videos")
-        self.handle_consent()
-        sleep(2)
+        # Through get(): resource blocking, consent and the page_loads record apply
+        self.get(self.driver.current_url.rstrip('/') + "/videos")
+        return self.__popular_channel_videos()
+
+    def prefetch_channel_videos(self, handle):
+        """
+        Start loading a channel's /videos page in a background tab, without
+        leaving the current page (e.g. while a video plays).
+
+        Returns the tab's window handle, for top_videos_from_tab.
+        """
+        url = channel_url(handle) + '/videos'
+        self.__log(f"Prefetching {url} in a background tab")
+        if not isinstance(self.driver, Chrome):
+            before = set(self.driver.window_handles)
+            self.driver.execute_script("window.open(arguments[0], '_blank');", url)
+            return (set(self.driver.window_handles) - before).pop()
+
+        # Target ids are the chromedriver window handles. The tab opens blank so
+        # request blocking (set per tab) is in place before the channel loads
+        tab = self.driver.execute_cdp_cmd('Target.createTarget', {'url': 'about:blank', 'background': True})['targetId']
+        current = self.driver.current_window_handle
+        self.driver.switch_to.window(tab)
+        try:
+            if self.blocked_urls:
+                self.block_resources(self.blocked_urls)
+            # Returns once the navigation starts, not when the page has loaded
+            self.driver.execute_cdp_cmd('Page.navigate', {'url': url})
+        finally:
+            self.driver.switch_to.window(current)
+        return tab
+
+    def top_videos_from_tab(self, tab):
+        """
+        Switch to a prefetched channel tab (closing the current one) and retrieve its popular videos.
+
+        Returns None, staying on the current tab, if the prefetched tab cannot be used.
+        """
+        start = monotonic()
+        previous = self.driver.current_window_handle
+        try:
+            self.driver.switch_to.window(tab)
+        except WebDriverException as e:
+            self.__log(f"Prefetched tab unavailable: {e}")
+            return None
+        self.close_tab(previous)
+        with self.__timed('prefetched_channel_load'):
+            self.wait_for(document_ready(), timeout=10)
+        self.__record_page_load('channel', monotonic() - start)
+        return self.__popular_channel_videos()
+
+    def close_tab(self, tab):
+        """Close a background tab and come back to the current one."""
+        current = self.driver.current_window_handle
+        try:
+            self.driver.switch_to.window(tab)
+            self.driver.close()
+        except WebDriverException as e:
+            self.__log(f"Could not close tab: {e}")
+        self.driver.switch_to.window(current)
+
+    def __popular_channel_videos(self):
+        """Click the 'Popular' chip of the current channel /videos page and retrieve its videos."""
+        with self.__timed('channel_videos_load'):
+            self.wait_for(EC.presence_of_element_located((By.XPATH, "//div[contains(@class, 'ytChipShapeChip')]")), timeout=10)
 
         # Click on "Popular" with enhanced detection
         chips = self.driver.find_elements(By.XPATH, "//div[contains(@class, 'ytChipShapeChip')]")
@@ -247,39 +1022,24 @@ class EYTDriver:
             if any(variation in chip_text for variation in popular_variations):
                 self.__log(f"'Popular' button found: '{chip.text.strip()}', clicking.")
                 self.driver.execute_script("arguments[0].click();", chip)
-                try:
-                    WebDriverWait(self.driver, 10).until(
-                        EC.presence_of_element_located((By.TAG_NAME, "ytd-rich-item-renderer"))
-                    )
-                    sleep(2)  # Increased sleep for Docker
+                with self.__timed('popular_videos_load'):
+                    loaded = self.wait_for(element_count_stable((By.TAG_NAME, 'ytd-rich-item-renderer')), timeout=10)
+                if loaded:
                     found = True
                     break
-                except TimeoutException:
-                    self.__log("Timeout waiting for videos to load after clicking Popular")
-                    continue
+                self.__log("Timeout waiting for videos to load after clicking Popular")
 
         if not found:
             self.__log("No 'Popular' button found. Trying fallback: getting recent videos...")
             # Fallback: just get the videos from /videos page without clicking Popular
-            sleep(3)
+            with self.__timed('channel_videos_fallback_load'):
+                self.wait_for(element_count_stable((By.TAG_NAME, 'ytd-rich-item-renderer')), timeout=5)
             return self.__get_channel_videos_fallback()
 
         # Retrieve popular videos with 2025 SELECTOR
         self.__log("Retrieving popular videos...")
-        videos = []
         try:
-            video_elements = self.driver.find_elements(By.TAG_NAME, 'ytd-rich-item-renderer')
-            self.__log(f"Found {len(video_elements)} video elements")
-            
-            for video_elem in video_elements:
-                try:
-                    link = video_elem.find_element(By.CSS_SELECTOR, 'a#video-title-link')
-                    href = link.get_attribute('href')
-                    if href:
-                        videos.append(Video(video_elem, href))
-                except Exception as e:
-                    continue
-            
+            videos = self.extract_videos('ytd-rich-item-renderer', 'a#video-title-link')
             self.__log(f"Retrieved {len(videos)} popular videos")
             return videos
             
@@ -291,23 +1051,11 @@ class EYTDriver:
         """Fallback method to get channel videos without Popular button."""
         self.__log("Using fallback method to get channel videos...")
         try:
-            # Try to get any videos from the current page
-            video_elements = self.driver.find_elements(By.TAG_NAME, 'ytd-rich-item-renderer')
-            if not video_elements:
+            # Try to get any videos from the current page (limit to 10 videos)
+            videos = self.extract_videos('ytd-rich-item-renderer', limit=10)
+            if not videos:
                 # Try alternative selectors
-                video_elements = self.driver.find_elements(By.CSS_SELECTOR, '[id="dismissible"]')
-            
-            self.__log(f"Fallback: Found {len(video_elements)} video elements")
-            
-            videos = []
-            for video_elem in video_elements[:10]:  # Limit to 10 videos
-                try:
-                    link = video_elem.find_element(By.CSS_SELECTOR, 'a[href*="/watch?v="]')
-                    href = link.get_attribute('href')
-                    if href:
-                        videos.append(Video(video_elem, href))
-                except Exception as e:
-                    continue
+                videos = self.extract_videos('[id="dismissible"]', limit=10)
             
             self.__log(f"Fallback: Retrieved {len(videos)} videos")
             return videos
@@ -320,36 +1068,31 @@ class EYTDriver:
     # CORRECTED METHODS (2025 selectors)
     # ========================================
 
-    def get_homepage_recommendations(self, scroll_times=0):
-        """Retrieve homepage videos with 2025 SELECTORS."""
+    def get_homepage_recommendations(self, scroll_times=0, max_results=None):
+        """
+        Retrieve homepage videos with 2025 SELECTORS: the first `max_results`
+        (scrolling only as far as needed), else those loaded after `scroll_times` scrolls.
+        """
         self.__log("Getting homepage recommendations")
         
+        start = monotonic()
         try:
             self.__log('Clicking homepage icon')
             self.driver.find_element(By.ID, 'logo-icon').click()
+            navigated = False
         except:
             self.__log('Getting homepage via URL')
-            self.get('https://www.youtube.com')
+            self.get(YOUTUBE_URL)
+            navigated = True
 
-        sleep(2)
-
-        # Scroll to load more content
-        for _ in range(scroll_times):
-            self.driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.PAGE_DOWN)
-            sleep(0.2)
+        with self.__timed('homepage_load'):
+            self.wait_for(element_count_stable((By.TAG_NAME, 'ytd-rich-item-renderer')), timeout=10)
+        if not navigated:
+            self.__record_page_load('home', monotonic() - start, navigation=False)
 
         # 2025 SELECTOR: ytd-rich-item-renderer
-        video_containers = self.driver.find_elements(By.TAG_NAME, 'ytd-rich-item-renderer')
-        
-        homepage = []
-        for container in video_containers:
-            try:
-                link = container.find_element(By.TAG_NAME, 'a')
-                href = link.get_attribute('href')
-                if href and '/watch?v=' in href:
-                    homepage.append(Video(link, href))
-            except:
-                continue
+        max_scrolls = scroll_times if max_results is None else 50
+        homepage = list(islice(self.iter_videos('ytd-rich-item-renderer', 'a', step='homepage_scroll', max_scrolls=max_scrolls), max_results))
 
         self.__log(f"Found {len(homepage)} homepage videos")
         return homepage
@@ -359,26 +1102,27 @@ class EYTDriver:
         🎯 CORE OF THE FIX! Recommendations with CORRECT 2025 SELECTORS
         """
         self.__log("Getting up-next recommendations with MODERN 2025 selectors")
-        
-        sleep(2)
 
         try:
+            if self.extraction == 'json':
+                match = VIDEO_ID_RE.search(self.driver.current_url)
+                with self.__timed('upnext_load'):
+                    recommendations = self.extract_page_data('watch_next', 'ytd-watch-next-secondary-results-renderer',
+                                                             limit=topn, video_id=match.group(1) if match else None)
+                if recommendations:
+                    self.__log(f"Found {len(recommendations)} recommendations in page data")
+                    return recommendations
+                self.__log("No recommendations in page data, scraping the page")
+
             # MODERN 2025 SELECTOR: yt-lockup-view-model
-            elems = WebDriverWait(self.driver, 15).until(
-                EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'ytd-watch-next-secondary-results-renderer yt-lockup-view-model'))
-            )
-            
-            self.__log(f"Found {len(elems)} lockup elements")
-            
-            recommendations = []
-            for elem in elems[:topn]:
-                try:
-                    link = elem.find_element(By.CSS_SELECTOR, 'a[href*="/watch?v="]')
-                    href = link.get_attribute('href')
-                    if href:
-                        recommendations.append(Video(elem, href))
-                except Exception as e:
-                    continue
+            with self.__timed('upnext_load'):
+                self.wait_for(element_count_stable(
+                    (By.CSS_SELECTOR, 'ytd-watch-next-secondary-results-renderer yt-lockup-view-model'),
+                    min_count=topn
+                ), timeout=15)
+
+            # Fewer than topn may have rendered in time: take whatever is there
+            recommendations = self.extract_videos('ytd-watch-next-secondary-results-renderer yt-lockup-view-model', limit=topn)
             
             self.__log(f"Found {len(recommendations)} recommendations")
             return recommendations
@@ -387,75 +1131,110 @@ class EYTDriver:
             self.__log(f"Failed to get recommendations: {e}")
             return []
 
-    def search_videos(self, query, scroll_times=0):
-        """Search with 2025 SELECTORS."""
+    def search_videos(self, query, scroll_times=0, max_results=None):
+        """
+        Search with 2025 SELECTORS: the first `max_results` results (scrolling
+        only as far as needed), else those loaded after `scroll_times` scrolls.
+        """
+        self.__open_search(query)
+        # Page data only holds the first page of results: scrolling needs the rendered page
+        if self.extraction == 'json' and not scroll_times:
+            with self.__timed('search_load'):
+                results = self.extract_page_data('search', 'ytd-search')
+            if results and (max_results is None or len(results) >= max_results):
+                self.__log(f"Found {len(results)} search results in page data")
+                return results[:max_results]
+            self.__log("Not enough search results in page data, scraping the page")
+
+        max_scrolls = scroll_times if max_results is None else 50
+        results = list(islice(self.__iter_search_page(max_scrolls), max_results))
+
+        self.__log(f"Found {len(results)} search results")
+        return results
+
+    def iter_search_results(self, query, max_scrolls=50):
+        """Search and yield the results as they load; stop iterating to stop scrolling (see iter_videos)."""
+        self.__open_search(query)
+        return self.__iter_search_page(max_scrolls)
+
+    def __open_search(self, query):
         self.__log(f"Searching for videos: '{query}'")
         
         # Encode query for URL
         from urllib.parse import quote_plus
         encoded_query = quote_plus(query)
-        search_url = f'https://www.youtube.com/results?search_query={encoded_query}'
+        search_url = f'{YOUTUBE_URL}/results?search_query={encoded_query}'
         self.get(search_url)
-        sleep(3)  # Give more time for search results to load
-
-        # Scroll for more results
-        for _ in range(scroll_times):
-            self.driver.find_element(By.TAG_NAME, 'body').send_keys(Keys.PAGE_DOWN)
-            sleep(0.5)  # Increase delay between scrolls
 
+    def __iter_search_page(self, max_scrolls):
+        with self.__timed('search_load'):
+            self.wait_for(element_count_stable((By.TAG_NAME, 'ytd-video-renderer')), timeout=15)
         # 2025 SELECTOR: ytd-video-renderer
-        video_elements = self.driver.find_elements(By.TAG_NAME, 'ytd-video-renderer')
-        
-        results = []
-        for video_elem in video_elements:
-            try:
-                link = video_elem.find_element(By.TAG_NAME, 'a')
-                href = link.get_attribute('href')
-                if href and '/watch?v=' in href:
-                    results.append(Video(link, href))
-            except:
-                continue
+        yield from self.iter_videos('ytd-video-renderer', 'a', step='search_scroll', max_scrolls=max_scrolls)
 
-        self.__log(f"Found {len(results)} search results")
-        return results
+    def play(self, video, duration=5, playback_rate=1.0, seek_to=None):
+        """
+        Video playback with ENHANCED handling. Returns once `duration` seconds
+        of the video itself (not ads) have actually played.
 
-    def play(self, video, duration=5):
-        """Video playback with ENHANCED handling."""
-        self.__log(f"Playing video for {duration} seconds")
+        Args:
+            playback_rate: Player speed; above 1 the watched time is reached in less wall time
+            seek_to: Start watching at this position (seconds) instead of the beginning
+
+        Returns the watch stats: {'watched_seconds', 'watch_status', 'watch_wall_seconds',
+        'playback_rate', 'effective_rate', 'ads', 'ad_seconds', 'ads_skipped'}.
+        """
+        self.__log(f"Playing video for {duration} seconds" + (f" at {playback_rate}x" if playback_rate != 1 else ''))
         
+        stats = dict(watched_seconds=0.0, watch_status='error', watch_wall_seconds=0.0, playback_rate=playback_rate,
+                     effective_rate=None, ads=0, ad_seconds=0.0, ads_skipped=0)
         try:
-            self.__click_video_enhanced(video)
-            sleep(2)
-            self.__check_video_availability_enhanced()
+            start = monotonic()
+            navigated = self.__click_video_enhanced(video)
+            with self.__timed('watch_page_load'):
+                self.wait_for(EC.url_contains('/watch'), timeout=10)
+                self.__check_video_availability_enhanced()
+            if not navigated:
+                # In-app navigation (get() records full loads itself)
+                self.__record_page_load('watch', monotonic() - start, navigation=False)
             self.__click_play_button_enhanced()
-            self.__handle_ads_enhanced()
+            stats['ads_skipped'] = self.__handle_ads_enhanced()
             self.__clear_prompts_enhanced()
-            sleep(duration)
+            if seek_to:
+                self.driver.execute_script(SEEK_JS, seek_to)
+            watch_start = monotonic()
+            stats.update(self.__watch_until(duration, stats, playback_rate))
+            stats['watch_wall_seconds'] = round(monotonic() - watch_start, 1)
+            # Includes mid-roll ads shown while watching
+            stats.update(self.__ad_stats())
             
         except Exception as e:
             self.__log(f"Error during video playback: {e}")
+        return stats
 
     # ========================================
     # ENHANCED METHODS (robust)
     # ========================================
 
     def __click_video_enhanced(self, video):
-        """Video click with multiple fallbacks."""
+        """Video click with multiple fallbacks. Returns True if the page was loaded by URL."""
         if hasattr(video, 'elem') and hasattr(video, 'url'):
             try:
                 self.__log("Clicking video element via Selenium...")
                 video.elem.click()
-                return
-            except Exception as e:
+                return False
+            except Exception:
                 try:
                     self.__log("Trying JavaScript click...")
                     self.driver.execute_script('arguments[0].click()', video.elem)
-                    return
-                except Exception as e:
+                    return False
+                except Exception:
                     self.__log("Loading video URL directly...")
                     self.get(video.url)
+                    return True
         elif isinstance(video, str):
             self.get(video)
+            return True
         else:
             raise ValueError(f'Unsupported video parameter type: {type(video)}')
 
@@ -500,72 +1279,96 @@ class EYTDriver:
         except Exception as e:
             self.__log(f"Could not find/click play button: {e}")
 
-    def __handle_ads_enhanced(self):
-        """Ad handling with multiple detection and timeout."""
+    def __watch_until(self, duration, stats, playback_rate=1.0, max_interruptions=5):
+        """
+        Monitor the player until `duration` seconds of content have played, the
+        video ends or playback cannot progress. Mid-roll ads and pauses (e.g. by
+        a prompt) hand control back here to be dealt with, then monitoring resumes.
+
+        Returns {'watched_seconds', 'watch_status', 'effective_rate'}; the status is
+        'reached', 'ended', 'paused', 'ad', 'timeout' or 'no_player'. The effective
+        rate is content seconds per wall second while playing.
+        """
+        watched = 0.0
+        playing = 0.0
+        status = 'reached'
+        # Time allowed for ads, buffering and interruptions on top of the watch itself
+        deadline = monotonic() + duration + max(60, duration)
+        for _ in range(max_interruptions + 1):
+            remaining = deadline - monotonic()
+            if watched >= duration:
+                status = 'reached'
+                break
+            if remaining <= 0:
+                status = 'timeout'
+                break
+            self.driver.set_script_timeout(remaining + 5)
+            result = self.driver.execute_async_script(WATCH_PROGRESS_JS, duration - watched, int(remaining * 1000), playback_rate)
+            watched += result['watched']
+            playing += result['playing']
+            status = result['status']
+            if status == 'ad':
+                stats['ads_skipped'] += self.__handle_ads_enhanced(max_wait=min(60, remaining), new_watch=False)
+            elif status == 'paused':
+                self.__log("Playback paused, clearing prompts and resuming")
+                self.__clear_prompts_enhanced()
+                self.__click_play_button_enhanced()
+            else:
+                break
+        self.__log(f"Watched {watched:.1f}s of {duration}s ({status})")
+        effective_rate = round(watched / playing, 2) if playing > 0 else None
+        return dict(watched_seconds=round(watched, 1), watch_status=status, effective_rate=effective_rate)
+
+    def __handle_ads_enhanced(self, max_wait=60, new_watch=True):
+        """
+        Wait for ads to end, clicking skip as soon as it is offered. Blocks on
+        player events reported by an injected observer instead of polling.
+        `new_watch` resets the ad counters (False for mid-roll ads).
+
+        Returns the number of ads skipped.
+        """
         self.__log("Checking for ads...")
-        sleep(1)
-        
-        max_attempts = 30  # Maximum 30 attempts (60 seconds)
-        attempts = 0
-        
-        while attempts < max_attempts:
-            try:
-                attempts += 1
-                
-                # MULTIPLE DETECTION of ads
-                ad_indicators = [
-                    '.ytp-ad-preview-container',
-                    '.ytp-ad-player-overlay',
-                    '.video-ads',
-                    '[class*="ad-showing"]'
-                ]
-                
-                ad_detected = False
-                for indicator in ad_indicators:
-                    try:
-                        ad_elem = self.driver.find_element(By.CSS_SELECTOR, indicator)
-                        if ad_elem.is_displayed():
-                            ad_detected = True
-                            break
-                    except:
-                        continue
-                
-                if not ad_detected:
-                    self.__log("No ads detected")
-                    return
-                
-                self.__log(f"Ad detected (attempt {attempts}/{max_attempts}), looking for skip button...")
-                
-                # MULTIPLE SELECTORS for skip
-                skip_selectors = [
-                    '.ytp-ad-skip-button-container',
-                    '.ytp-ad-skip-button',
-                    'button[class*="skip"]',
-                    '.ytp-skip-ad-button',
-                    '.videoAdUiSkipButton',
-                    '[id*="skip"]'
-                ]
-                
-                for selector in skip_selectors:
-                    try:
-                        skip_btn = self.driver.find_element(By.CSS_SELECTOR, selector)
-                        if skip_btn.is_displayed() and skip_btn.is_enabled():
-                            skip_btn.click()
-                            self.__log("Ad skipped!")
-                            return
-                    except:
-                        continue
-                
-                # If after 10 attempts, give up and continue
-                if attempts >= 10:
-                    self.__log(f"Could not skip ad after {attempts} attempts, continuing anyway...")
-                    return
-                
-                sleep(2)
-                
-            except Exception as e:
-                self.__log(f"Error in ad handling: {e}")
+        self.wait_for(EC.presence_of_element_located((By.ID, 'movie_player')), timeout=5)
+        if not self.driver.execute_script(AD_OBSERVER_JS, new_watch):
+            self.__log("No player found for ad detection")
+            return 0
+
+        skipped = 0
+        ad_seen = False
+        # Consecutive clicks on a skip button that stayed displayed
+        unanswered = 0
+        deadline = monotonic() + max_wait
+        self.driver.set_script_timeout(max_wait + 5)
+        while monotonic() < deadline:
+            event = self.driver.execute_async_script(WAIT_AD_EVENT_JS, int((deadline - monotonic()) * 1000), unanswered < 3)
+            if not event['showing']:
+                self.__log("Ads finished" if ad_seen else "No ads detected")
+                return skipped
+            if event.get('timeout'):
                 break
+            # A skip button is displayed
+            ad_seen = True
+            try:
+                event['skip'].click()
+            except WebDriverException:
+                self.driver.execute_script('arguments[0].click()', event['skip'])
+            # Polling again before the player reacts would click (and count) the same button twice
+            wait_ms = int(max(0, min(2, deadline - monotonic())) * 1000)
+            if self.driver.execute_async_script(WAIT_AD_SKIPPED_JS, event['skip'], wait_ms):
+                unanswered = 0
+                skipped += 1
+                self.__log("Ad skipped!")
+            else:
+                unanswered += 1
+                if unanswered == 3:
+                    self.__log("Skip button does not respond, waiting for the ad to end...")
+        self.__log(f"Ads still showing after {max_wait}s, continuing anyway...")
+        return skipped
+
+    def __ad_stats(self):
+        """Number of ads and seconds of ads since the observer was (re)armed for this watch."""
+        stats = self.driver.execute_script(AD_STATS_JS)
+        return dict(ads=stats['ads'], ad_seconds=round(stats['seconds'], 1)) if stats else dict(ads=0, ad_seconds=0.0)
 
     def __clear_prompts_enhanced(self):
         """Close popups with multiple selectors."""
@@ -585,7 +1388,7 @@ class EYTDriver:
                     if popup_btn.is_displayed():
                         popup_btn.click()
                         self.__log("Popup closed")
-                        sleep(1)
+                        self.wait_for(EC.invisibility_of_element(popup_btn), timeout=3)
                         return
                 except:
                     continue
@@ -0,0 +1,130 @@
+"""
+Append-only JSON Lines log of sockpuppet actions
+
+Each line is one record: a 'start' record (puppet id, arguments), one 'action'
+record per add_action() call and an 'end' (or 'exception') record. Records are
+buffered and written + fsynced in batches, so a crash loses at most the last
+unflushed batch instead of the whole trace.
+
+Usage:
+    python action_log.py output/actions/<puppetId>.jsonl > puppet.json
+"""
+import json
+import os
+import sys
+from datetime import datetime
+from time import monotonic
+
+# Actions whose params are video ids (one id for 'watch', a ranked list otherwise);
+# others carry dicts or paths (e.g. 'snapshot', 'from_snapshot')
+VIDEO_ACTIONS = ('watch', 'get_homepage', 'get_recommendations', 'search_results', 'search_recommendations', 'crawl_hop')
+
+
+class ActionLog:
+    """Buffered, fsynced append-only writer."""
+
+    def __init__(self, path, batch_size=20, flush_interval=5.0):
+        """
+        Args:
+            path: JSON Lines file (appended to if it exists)
+            batch_size: Flush once this many records are buffered
+            flush_interval: Flush on the next write if the last flush is older than this (seconds)
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.__buffer = []
+        self.__last_flush = monotonic()
+        self.__file = open(path, 'a', encoding='utf-8')
+
+    def write(self, record_type, flush=False, **fields):
+        """Buffer one record, stamped with the current time."""
+        record = dict(type=record_type, time=datetime.now().isoformat(), **fields)
+        self.__buffer.append(json.dumps(record, default=str))
+        if flush or len(self.__buffer) >= self.batch_size or monotonic() - self.__last_flush >= self.flush_interval:
+            self.flush()
+        return record
+
+    def flush(self):
+        """Write buffered records and fsync them to disk."""
+        if self.__buffer:
+            self.__file.write('\n'.join(self.__buffer) + '\n')
+            self.__buffer = []
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+        self.__last_flush = monotonic()
+
+    def close(self):
+        if not self.__file.closed:
+            self.flush()
+            self.__file.close()
+
+
+def read_records(path):
+    """Records of a log, ignoring a last line truncated by a crash."""
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return records
+
+
+def action_from_record(record):
+    """Puppet action entry of an 'action' record, with its extra fields (e.g. ad time of a watch)."""
+    details = {k: v for k, v in record.items() if k not in ('type', 'action', 'params', 'time')}
+    return dict(action=record['action'], params=record.get('params'), time=record['time'], **details)
+
+
+def recommendation_graph(actions):
+    """Recommendation graph of the crawl ({'seeds', 'nodes', 'edges'}) rebuilt from the actions, or None."""
+    starts = [a for a in actions if a['action'] == 'crawl_start']
+    if not starts:
+        return None
+    edges = []
+    nodes = dict.fromkeys(starts[-1]['params']['seeds'], 0)
+    for action in actions:
+        if action['action'] != 'crawl_hop':
+            continue
+        for rank, target in enumerate(action['params'], start=1):
+            edges.append(dict(source=action['source'], target=target, rank=rank, depth=action['depth'] + 1))
+            nodes.setdefault(target, action['depth'] + 1)
+    return dict(seeds=starts[-1]['params']['seeds'], nodes=[dict(id=video_id, depth=depth) for video_id, depth in nodes.items()], edges=edges)
+
+
+def reconstruct_puppet(path):
+    """Rebuild the puppet JSON written by sockpuppet.save_puppet from its action log."""
+    records = read_records(path)
+    start = next((r for r in records if r['type'] == 'start'), {})
+    end = next((r for r in reversed(records) if r['type'] in ('end', 'exception')), None)
+    args = start.get('args', {})
+    actions = [action_from_record(r) for r in records if r['type'] == 'action']
+
+    puppet = dict(
+        puppet_id=start.get('puppet_id'),
+        start_time=start.get('time'),
+        end_time=end['time'] if end else (records[-1]['time'] if records else None),
+        duration=args.get('duration'),
+        description=args.get('description'),
+        actions=actions,
+        recommendation_graph=recommendation_graph(actions),
+        args=args,
+        # False when the run crashed or was killed before save_puppet
+        complete=bool(end and end['type'] == 'end')
+    )
+    if end and end['type'] == 'exception':
+        puppet['exception'] = end.get('exception')
+    if end:
+        for key in ('step_timings', 'page_loads', 'browser', 'watch_mode'):
+            if key in end:
+                puppet[key] = end[key]
+    return puppet
+
+
+if __name__ == '__main__':
+    json.dump(reconstruct_puppet(sys.argv[1]), sys.stdout, default=str, indent=4)
@@ -7,6 +7,18 @@ import json
 import os
 from collections import defaultdict
 import pandas as pd
+from similarity_metrics import pairwise_metrics, group_means
+
+try:
+    from metadata_cache import MetadataCache, DEFAULT_PATH as METADATA_CACHE_PATH
+except ImportError:
+    MetadataCache = None
+
+try:
+    import pyarrow
+    import results_store
+except ImportError:
+    results_store = None
 
 def load_puppet_results(output_dir="output/puppets"):
     """Load all puppet result files"""
@@ -22,15 +34,27 @@ def load_puppet_results(output_dir="output/puppets"):
     
     return results
 
-def extract_search_data(results):
-    """Extract search results and recommendations by ideology"""
+def search_queries(results):
+    """Queries searched by the puppets, in first-seen order."""
+    queries = {}
+    for data in results.values():
+        for action in data.get('actions', []):
+            if action['action'] == 'search_results':
+                queries.setdefault(action.get('query', (data.get('args') or {}).get('searchQuery')), None)
+    return list(queries)
+
+def extract_search_data(results, query=None):
+    """Extract search results and recommendations by ideology (for one query of multi-query puppets)"""
     search_data = {}
     
     for ideology, data in results.items():
         search_results = []
         recommendations = []
+        default_query = (data.get('args') or {}).get('searchQuery')
         
         for action in data.get('actions', []):
+            if query is not None and action.get('query', default_query) != query:
+                continue
             if action['action'] == 'search_results':
                 search_results = action['params']
             elif action['action'] == 'search_recommendations':
@@ -43,6 +67,30 @@ def extract_search_data(results):
     
     return search_data
 
+def puppet_labels(puppet_ids):
+    """Display label per puppet: its ideology, suffixed with the puppet uuid when an ideology has several puppets."""
+    ideologies = [puppet_id.split(',')[0] for puppet_id in puppet_ids]
+    return {
+        puppet_id: ideology if ideologies.count(ideology) == 1 else f"{ideology}[{puppet_id.split(',')[-1]}]"
+        for puppet_id, ideology in zip(puppet_ids, ideologies)
+    }
+
+def extract_search_data_from_store(df, query=None):
+    """Same structure as extract_search_data, built from the results store (one entry per puppet)."""
+    df = df[df['action'].isin(['search_results', 'search_recommendations'])]
+    if query is not None:
+        df = df[df['query'] == query]
+    labels = puppet_labels(sorted(df['puppet_id'].unique()))
+
+    search_data = {}
+    for puppet_id, label in labels.items():
+        puppet_df = df[df['puppet_id'] == puppet_id].sort_values('rank')
+        search_data[label] = {
+            'search_results': puppet_df[puppet_df['action'] == 'search_results']['video_id'].tolist(),
+            'recommendations': puppet_df[puppet_df['action'] == 'search_recommendations']['video_id'].tolist()
+        }
+    return search_data
+
 def analyze_overlap(search_data):
     """Analyze overlap and differences between ideologies"""
     ideologies = list(search_data.keys())
@@ -102,24 +150,44 @@ def analyze_recommendations_diversity(search_data):
         print(f"{ideology}: {len(unique_to_ideology)} unique recommendations")
         print(f"  {list(unique_to_ideology)}")
 
+def analyze_similarity(search_data, depth=None):
+    """Pairwise Jaccard / rank-biased overlap / Kendall tau between puppets, averaged by ideology"""
+    print("\n=== SIMILARITY ANALYSIS ===")
+
+    labels = list(search_data.keys())
+    # Replicates are labelled 'Ideology[uuid]' (see puppet_labels)
+    ideologies = [label.split('[')[0] for label in labels]
+
+    for key, title in [('search_results', 'SEARCH RESULTS'), ('recommendations', 'RECOMMENDATIONS')]:
+        metrics = pairwise_metrics([search_data[label][key] for label in labels], depth=depth)
+        print(f"\n--- {title} ({len(labels)} puppets) ---")
+        for name, matrix in metrics.items():
+            groups, means = group_means(matrix, ideologies)
+            print(f"\n{name} (mean over puppet pairs, within-ideology on the diagonal):")
+            print(pd.DataFrame(means, index=groups, columns=groups).round(3).to_string())
+
+def load_titles(video_ids, cache_path=None):
+    """Titles of the videos found in the metadata cache (see metadata_enrichment.py); nothing is fetched."""
+    cache_path = cache_path or (METADATA_CACHE_PATH if MetadataCache else None)
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    cache = MetadataCache(cache_path)
+    try:
+        return {video_id: metadata.title for video_id, metadata in cache.get_many(video_ids).items()}
+    finally:
+        cache.close()
+
 def generate_comparison_table(search_data):
     """Generate a comparison table of results"""
     print("\n=== COMPARISON TABLE ===")
     
-    # Create DataFrame
-    rows = []
-    max_results = max(len(data['search_results']) for data in search_data.values())
-    
-    for i in range(max_results):
-        row = {'Position': i+1}
-        for ideology, data in search_data.items():
-            if i < len(data['search_results']):
-                row[ideology] = data['search_results'][i]
-            else:
-                row[ideology] = ''
-        rows.append(row)
-    
-    df = pd.DataFrame(rows)
+    # One column per puppet, padded to the longest result list
+    df = pd.DataFrame({ideology: pd.Series(data['search_results'], dtype=object) for ideology, data in search_data.items()})
+    titles = load_titles(pd.Series(df.values.ravel()).dropna().unique().tolist())
+    if titles:
+        df = df.map(lambda video_id: f"{video_id} ({titles[video_id][:30]})" if video_id in titles else video_id)
+    df = df.fillna('')
+    df.insert(0, 'Position', range(1, len(df) + 1))
     print(df.to_string(index=False))
 
 def main():
@@ -129,19 +197,37 @@ def main():
     
     # Load results
     try:
-        results = load_puppet_results()
-        print(f"Loaded results for {len(results)} ideologies: {list(results.keys())}\n")
+        if results_store:
+            # Incremental: only puppet files not yet in the store are read
+            new_files = results_store.ingest()
+            df = results_store.load_results()
+            print(f"Ingested {new_files} new puppet files; store has {df['puppet_id'].nunique()} puppets\n")
+            queries = list(df.loc[df['action'] == 'search_results', 'query'].drop_duplicates())
+            # One analysis per query of multi-query puppets
+            per_query = [(query, extract_search_data_from_store(df, query if len(queries) > 1 else None)) for query in queries or [None]]
+        else:
+            print("pyarrow not available, reading puppet JSON files directly")
+            results = load_puppet_results()
+            print(f"Loaded results for {len(results)} ideologies: {list(results.keys())}\n")
+            # Extract search data
+            queries = search_queries(results)
+            per_query = [(query, extract_search_data(results, query if len(queries) > 1 else None)) for query in queries or [None]]
     except Exception as e:
         print(f"Error loading results: {e}")
         return
-    
-    # Extract search data
-    search_data = extract_search_data(results)
+    per_query = [(query, search_data) for query, search_data in per_query if search_data]
+    if not per_query:
+        print("No search results found")
+        return
     
     # Perform analysis
-    analyze_overlap(search_data)
-    analyze_recommendations_diversity(search_data)
-    generate_comparison_table(search_data)
+    for query, search_data in per_query:
+        if len(per_query) > 1:
+            print(f"\n{'#' * 50}\nQUERY: {query}\n{'#' * 50}\n")
+        analyze_overlap(search_data)
+        analyze_recommendations_diversity(search_data)
+        analyze_similarity(search_data)
+        generate_comparison_table(search_data)
     
     print("\n=== SUMMARY ===")
     print("Analysis complete! This shows how YouTube's algorithm")
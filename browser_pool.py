@@ -0,0 +1,154 @@
+"""
+BrowserPool - keeps pre-launched Chrome instances (EYTDriver) warm for sockpuppet runs
+
+Each instance gets its own fresh user-data-dir. A leased browser is never reused:
+on release it is quit, its profile is wiped and a replacement is launched in the
+background, so the next lease does not pay Chrome's cold start.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import queue
+from contextlib import contextmanager
+from time import monotonic
+
+from EYTDriver import EYTDriver
+
+
+class BrowserPool:
+    """Pool of N warm, profile-isolated EYTDriver instances."""
+
+    def __init__(self, size=2, headless=True, use_virtual_display=False, profile_root=None, verbose=False):
+        """
+        Args:
+            size: Number of browsers kept warm
+            headless: Headless mode
+            use_virtual_display: Start one shared virtual display (Linux) for all browsers
+            profile_root: Directory holding the per-browser profiles (temporary if None)
+            verbose: Detailed logs
+        """
+        self.size = size
+        self.headless = headless
+        self.verbose = verbose
+        self.profile_root = profile_root or tempfile.mkdtemp(prefix='eyt_pool_')
+        # Seconds spent launching each browser / waiting for each lease
+        self.startup_times = []
+        self.lease_waits = []
+
+        self.__ready = queue.Queue()
+        self.__lock = threading.Lock()
+        self.__closed = False
+        self.__display = None
+
+        if use_virtual_display:
+            try:
+                from pyvirtualdisplay import Display
+                self.__log("Starting shared virtual display")
+                self.__display = Display(size=(1920, 1080))
+                self.__display.start()
+            except ImportError:
+                self.__log("pyvirtualdisplay not available")
+
+        for _ in range(size):
+            self.__spawn()
+
+    def __log(self, message):
+        """Conditional logging."""
+        if self.verbose:
+            print(message)
+
+    def __spawn(self):
+        """Launch a browser in the background and queue it once ready."""
+        threading.Thread(target=self.__launch, daemon=True).start()
+
+    def __launch(self):
+        try:
+            driver = EYTDriver(
+                browser='chrome',
+                profile_dir=os.path.join(self.profile_root, 'profile'),
+                headless=self.headless,
+                verbose=self.verbose
+            )
+        except Exception as e:
+            # Hand the failure to whoever is waiting instead of blocking them forever
+            self.__log(f"Browser launch failed: {e}")
+            self.__ready.put(e)
+            return
+        with self.__lock:
+            self.startup_times.append(driver.startup_seconds)
+            closed = self.__closed
+        if closed:
+            self.__discard(driver)
+        else:
+            self.__log(f"Browser ready in {driver.startup_seconds:.2f}s ({driver.profile_dir})")
+            self.__ready.put(driver)
+
+    def __discard(self, driver):
+        """Quit a browser and wipe its profile directory."""
+        driver.quit()
+        if driver.profile_dir:
+            shutil.rmtree(driver.profile_dir, ignore_errors=True)
+
+    def lease(self, timeout=None):
+        """Take a warm browser, waiting for one to become ready if necessary."""
+        start = monotonic()
+        try:
+            driver = self.__ready.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No browser available after {timeout}s")
+        if isinstance(driver, Exception):
+            # Keep the pool at its nominal size for the next lease
+            self.__spawn()
+            raise driver
+        driver.lease_wait = round(monotonic() - start, 3)
+        with self.__lock:
+            self.lease_waits.append(driver.lease_wait)
+        self.__log(f"Leased browser after {driver.lease_wait:.2f}s wait")
+        return driver
+
+    def release(self, driver):
+        """Return a leased browser: it is discarded and replaced by a fresh one."""
+        self.__discard(driver)
+        with self.__lock:
+            closed = self.__closed
+        if not closed:
+            self.__spawn()
+
+    @contextmanager
+    def leased(self, timeout=None):
+        """Context manager around lease()/release()."""
+        driver = self.lease(timeout)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def stats(self):
+        """Startup latency and lease wait summary (seconds)."""
+        with self.__lock:
+            startup_times = list(self.startup_times)
+            lease_waits = list(self.lease_waits)
+        return dict(
+            launches=len(startup_times),
+            mean_startup=round(sum(startup_times) / len(startup_times), 3) if startup_times else None,
+            max_startup=max(startup_times, default=None),
+            leases=len(lease_waits),
+            mean_lease_wait=round(sum(lease_waits) / len(lease_waits), 3) if lease_waits else None,
+            max_lease_wait=max(lease_waits, default=None)
+        )
+
+    def close(self):
+        """Quit all idle browsers and remove the profile root."""
+        with self.__lock:
+            self.__closed = True
+        while True:
+            try:
+                driver = self.__ready.get_nowait()
+            except queue.Empty:
+                break
+            if not isinstance(driver, Exception):
+                self.__discard(driver)
+        if self.__display:
+            self.__display.stop()
+        shutil.rmtree(self.profile_root, ignore_errors=True)
@@ -0,0 +1,229 @@
+"""
+Asynchronous lifecycle of sockpuppet containers
+
+An asyncio loop running in a background thread (docker-api.py stays synchronous)
+starts queued containers with at most `max_containers` running at once, streams
+each container's logs to output/logs/<puppetId>.log, waits for it under a
+wall-clock timeout (a hung Chrome session is killed instead of holding its slot
+forever) and removes it. One JSON line per container - puppets, status, exit
+code, runtime - is appended to output/containers.jsonl. Used as a context
+manager, an exception or Ctrl-C cancels the queued containers and kills and
+removes the running ones (found by their run label) instead of waiting for them.
+
+The Docker SDK is blocking, so its calls run in a dedicated thread pool sized
+for one log stream and one wait per running container.
+"""
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from time import monotonic
+from uuid import uuid4
+
+LOG_DIR = os.path.join(os.getcwd(), 'output', 'logs')
+# Label identifying the containers of one orchestrator (to clean them up on abort)
+RUN_LABEL = 'eyt.run'
+STATUS_PATH = os.path.join(os.getcwd(), 'output', 'containers.jsonl')
+# Exit status of a container that was not reaped normally
+TIMEOUT = 'timeout'
+LAUNCH_FAILED = 'launch_failed'
+
+
+class ContainerOrchestrator:
+    """Launches, watches and reaps containers concurrently."""
+
+    def __init__(self, client, max_containers, timeout=None, log_dir=LOG_DIR, status_path=STATUS_PATH, labels=None):
+        """
+        Args:
+            client: docker.DockerClient
+            max_containers: Maximum number of containers running at once
+            timeout: Wall-clock limit (seconds) per container, None for no limit
+            log_dir: Directory of the container log files
+            status_path: JSONL file receiving one record per finished container
+            labels: Labels added to every container
+        """
+        self.client = client
+        self.max_containers = max_containers
+        self.timeout = timeout
+        self.log_dir = log_dir
+        self.status_path = status_path
+        self.run_id = uuid4().hex[:12]
+        self.labels = dict(labels or {}, **{RUN_LABEL: self.run_id})
+        self.launched = 0
+        self.records = []
+        self.start_time = monotonic()
+        os.makedirs(log_dir, exist_ok=True)
+        if os.path.dirname(status_path):
+            os.makedirs(os.path.dirname(status_path), exist_ok=True)
+
+        self.__lock = threading.Lock()
+        self.__pending = set()
+        self.__executor = ThreadPoolExecutor(max_workers=2 * max_containers + 2, thread_name_prefix='docker')
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, daemon=True)
+        self.__thread.start()
+        # Created on the loop's thread (older Pythons bind it to the current loop)
+        self.__slots = self.__call_soon(asyncio.Semaphore, max_containers)
+
+    def __call_soon(self, function, *args):
+        async def call():
+            return function(*args)
+        return asyncio.run_coroutine_threadsafe(call(), self.__loop).result()
+
+    def __blocking(self, function, *args):
+        return self.__loop.run_in_executor(self.__executor, function, *args)
+
+    def run(self, image, command, name, puppets=(), **kwargs):
+        """
+        Queue a container; it starts as soon as a slot is free.
+
+        `kwargs` go to client.containers.run(). Returns a concurrent Future
+        resolving to the container's record once it has been reaped.
+        """
+        kwargs.pop('remove', None)
+        kwargs.pop('detach', None)
+        labels = dict(kwargs.pop('labels', {}), **self.labels)
+        future = asyncio.run_coroutine_threadsafe(self.__run(image, command, name, list(puppets), labels, kwargs), self.__loop)
+        with self.__lock:
+            self.__pending.add(future)
+        future.add_done_callback(self.__done)
+        return future
+
+    def __done(self, future):
+        with self.__lock:
+            self.__pending.discard(future)
+
+    def log_path(self, name, puppets):
+        """One file per puppet; multi-puppet containers share a file named after the container."""
+        return os.path.join(self.log_dir, f'{puppets[0] if len(puppets) == 1 else name}.log')
+
+    async def __run(self, image, command, name, puppets, labels, kwargs):
+        async with self.__slots:
+            start = monotonic()
+            record = dict(name=name, puppets=puppets, started_at=datetime.now().isoformat(),
+                          log=self.log_path(name, puppets), status=None, exit_code=None, error=None)
+            try:
+                # Kept after exit (no auto-remove) so its exit code can be read
+                container = await self.__blocking(lambda: self.client.containers.run(
+                    image, command, name=name, labels=labels, detach=True, **kwargs))
+            except Exception as e:
+                print(f"Container {name} failed to start: {e}")
+                record.update(status=LAUNCH_FAILED, error=str(e), runtime_seconds=0.0)
+                return self.__record(record)
+            self.launched += 1
+            print(f"Container {name} started ({len(puppets)} puppet(s))")
+
+            logs = self.__blocking(self.__stream_logs, container, record['log'])
+            try:
+                result = await asyncio.wait_for(self.__blocking(container.wait), self.timeout)
+                error = result.get('Error') or {}
+                record.update(status='exited', exit_code=result.get('StatusCode'), error=error.get('Message'))
+            except asyncio.TimeoutError:
+                print(f"Container {name} still running after {self.timeout}s, killing it")
+                record.update(status=TIMEOUT, exit_code=await self.__blocking(self.__kill, container))
+            except Exception as e:
+                record.update(status='error', error=str(e))
+            record['runtime_seconds'] = round(monotonic() - start, 1)
+
+            # The log stream ends with the container
+            try:
+                await asyncio.wait_for(logs, 30)
+            except Exception as e:
+                print(f"Incomplete logs for {name}: {e!r}")
+            await self.__blocking(self.__remove, container)
+        print(f"Container {name} {record['status']} (exit code {record['exit_code']}) after {record['runtime_seconds']}s")
+        return self.__record(record)
+
+    def __stream_logs(self, container, path):
+        with open(path, 'ab') as f:
+            for chunk in container.logs(stream=True, follow=True):
+                f.write(chunk)
+                f.flush()
+
+    def __kill(self, container):
+        """Kill a container and return its exit code."""
+        try:
+            container.kill()
+            return container.wait(timeout=30).get('StatusCode')
+        except Exception as e:
+            print(f"Could not kill container {container.name}: {e}")
+            return None
+
+    def __remove(self, container):
+        try:
+            container.remove(force=True)
+        except Exception as e:
+            print(f"Could not remove container {container.name}: {e}")
+
+    def __record(self, record):
+        with self.__lock:
+            self.records.append(record)
+            with open(self.status_path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        return record
+
+    def wait_all(self):
+        """Block until every queued container has been reaped. Returns their records."""
+        while True:
+            with self.__lock:
+                pending = set(self.__pending)
+            if not pending:
+                return list(self.records)
+            wait(pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        # Interrupted (Ctrl-C) or failed: do not wait for hours of queued containers
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def __stop_loop(self):
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join()
+        self.__loop.close()
+
+    def __remove_run_containers(self):
+        """Kill and remove every container started by this orchestrator. Returns their number."""
+        try:
+            containers = self.client.containers.list(all=True, filters={'label': f'{RUN_LABEL}={self.run_id}'})
+        except Exception as e:
+            print(f"Could not list containers: {e}")
+            return 0
+        for container in containers:
+            print(f"Killing container {container.name}")
+            self.__remove(container)
+        return len(containers)
+
+    def abort(self):
+        """Cancel the queued containers and kill and remove the running ones, without waiting for them."""
+        with self.__lock:
+            pending = set(self.__pending)
+        for future in pending:
+            future.cancel()
+        removed = self.__remove_run_containers()
+        # Blocked waits and log streams return once their container is gone; launches
+        # still in flight complete, and their containers are removed below
+        self.__executor.shutdown(wait=True, cancel_futures=True)
+        removed += self.__remove_run_containers()
+        self.__stop_loop()
+        print(f"Orchestrator aborted: {len(pending)} queued or running containers cancelled, {removed} killed")
+
+    def close(self):
+        """Wait for the queued containers, then stop the event loop."""
+        records = self.wait_all()
+        self.__stop_loop()
+        self.__executor.shutdown()
+
+        statuses = {}
+        for record in records:
+            statuses[record['status']] = statuses.get(record['status'], 0) + 1
+        failed = sum(record['status'] == 'exited' and record['exit_code'] != 0 for record in records)
+        print(f"Orchestrator: {self.launched} containers run in {monotonic() - self.start_time:.1f}s "
+              f"({', '.join(f'{n} {status}' for status, n in statuses.items()) or 'none'}, {failed} non-zero exit)")
+        print(f"Container statuses in {self.status_path}")
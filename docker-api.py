@@ -1,16 +1,25 @@
 from argparse import ArgumentParser
 from random import choice
 import docker
-from time import sleep
 import os
+from contextlib import nullcontext
 import pandas as pd
 from uuid import uuid4
 import json
+from profile_snapshot import is_complete
+from container_orchestrator import ContainerOrchestrator
 
 # our own ID
 IMAGE_NAME = 'fr-spain_ytb'
 OUTPUT_DIR = os.path.join(os.getcwd(), 'output')
 ARGS_DIR = os.path.join(os.getcwd(), 'arguments')
+EXPERIMENTS_DIR = os.path.join(OUTPUT_DIR, 'experiments')
+# List of labels - YOUR 4 IDEOLOGIES
+LABELS = ['Left', 'RadicalLeft', 'Right', 'ExtremeRight']
+# label put on every sockpuppet container
+SOCKPUPPET_LABEL = 'eyt.sockpuppet'
+# Memory (MB) of the warm spare browser each multi-puppet worker keeps (see sockpuppet.py)
+SPARE_BROWSER_MEMORY_MB = 300
 NUM_TRAINING_VIDEOS = 5
 WATCH_DURATION = 30
 
@@ -25,9 +34,22 @@ def parse_args():
     parser.add_argument('--build', action="store_true", help='Build docker image')
     parser.add_argument('--run', action="store_true", help='Run all docker containers')
     parser.add_argument('--simulate', action="store_true", help='Only generate arguments but do not start containers')
+    parser.add_argument('--matrix', default=None, help='JSON experiment spec (queries x ideologies x replicates) to run or resume; implies --run unless --simulate')
     parser.add_argument('--giletjaune', action="store_true", help='Run the 4 gilet jaune sockpuppets with existing configs')
     parser.add_argument('--max-containers', default=10, type=int, help="Maximum number of concurrent containers")
-    parser.add_argument('--sleep-duration', default=60, type=int, help="Time to sleep (in seconds) when max containers are reached and before spawning additional containers")
+    parser.add_argument('--puppets-per-container', default=1, type=int, help='Number of sockpuppets run concurrently inside one container (shares Xvfb and image layers)')
+    parser.add_argument('--puppet-memory', default=1024, type=int, help='Memory (in MB) reserved per sockpuppet in multi-puppet containers')
+    parser.add_argument('--full-page-load', action='store_true', help='Load every page resource (thumbnails, fonts, trackers) instead of blocking those the audit does not need')
+    parser.add_argument('--extraction', choices=['dom', 'json'], default='dom', help="Read search results and recommendations from the rendered page ('dom') or from YouTube's page data ('json')")
+    parser.add_argument('--no-channel-prefetch', action='store_true', help="Load each training channel only when its turn comes instead of in a background tab while the previous channel's videos play")
+    parser.add_argument('--playback-rate', default=1.0, type=float, help='Player speed for training watches (e.g. 2 reaches the watch duration in half the time)')
+    parser.add_argument('--seek-to', default=None, type=int, help='Start training watches at this position (seconds)')
+    parser.add_argument('--crawl-depth', default=0, type=int, help='Crawl the up-next recommendation graph this many hops from the top search results (0: no crawl)')
+    parser.add_argument('--crawl-branching', default=3, type=int, help='Recommendations followed at each hop of the crawl')
+    parser.add_argument('--crawl-budget', default=20, type=int, help='Maximum number of videos watched by the crawl')
+    parser.add_argument('--search-queries-file', default=None, help='File with one search query per line, all searched by each trained puppet (replaces --search-query)')
+    parser.add_argument('--search-reset', action='store_true', help='Restore the trained profile before each query of a multi-query search')
+    parser.add_argument('--puppet-timeout', default=180, type=int, help='Wall-clock limit (in minutes) of a sockpuppet container; hung containers are killed after it (0: no limit)')
     parser.add_argument('--training-videos', default='data/training-videos.csv', help='CSV file with training videos')
     parser.add_argument('--testing-videos', default='data/testing-videos.csv', help='CSV file with testing videos')
     parser.add_argument('--training-channels', default='data/chaines_clean.csv', help='CSV file with training channels')
@@ -66,12 +88,6 @@ def get_mount_volumes():
         data_dir: { "bind": "/app/data" }
     }
 
-def max_containers_reached(client, max_containers):
-    try:
-        return len(client.containers.list()) >= max_containers
-    except:
-        return True
-
 def get_channels_by_ideology(csv):
     """Retrieve channels by ideology from CSV file"""
     channels_df = pd.read_csv(csv, sep=';')
@@ -127,39 +143,227 @@ def get_training_videos(csv):
             'ExtremeRight': []
         }
 
-def spawn_containers(args):
-    # Get docker client (only if not in simulation mode)
-    if not args.simulate:
-        client = docker.from_env()
-    else:
-        client = None
-    
-    # List of labels - YOUR 4 IDEOLOGIES
-    LABELS = ['Left', 'RadicalLeft', 'Right', 'ExtremeRight']
-
-    # Get training data based on mode
+def load_training_data(args):
+    """Get training data based on mode"""
     if args.mode == 'channels':
         print(f"Mode: Channel training (CSV: {args.training_channels})")
-        training_data = get_channels_by_ideology(args.training_channels)
-        training_type = 'channels'
+        return get_channels_by_ideology(args.training_channels)
     else:
         print(f"Mode: Video training (CSV: {args.training_videos})")
-        training_data = get_training_videos(args.training_videos)
-        training_type = 'videos'
+        return get_training_videos(args.training_videos)
 
-    # Get seeds for testing (not used in search mode)
+def load_seeds(args):
+    """Get seeds for testing (not used in search mode)"""
     try:
-        seeds = pd.read_csv(args.testing_videos)['video_id'].to_list()
+        return pd.read_csv(args.testing_videos)['video_id'].to_list()
     except:
         # If no test seeds, use example videos
         print("Warning: No test seeds found. Using default values.")
-        seeds = ['9bZkp7q19f0', 'ZZ5LpwO-An4', 'K5le9sYdYkM']  # Examples from your arguments folder
+        return ['9bZkp7q19f0', 'ZZ5LpwO-An4', 'K5le9sYdYkM']  # Examples from your arguments folder
+
+def load_search_queries(path):
+    """Queries listed one per line."""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def write_puppet_args(args, training_label, training_data, seeds, search_query, **overrides):
+    """
+    Select training content for one sockpuppet and write its argument file.
+    `overrides` replace puppet arguments (e.g. steps, baseSnapshot).
+    Returns its puppetId (None if no training data).
+    """
+    # User data for training based on mode
+    if args.mode == 'channels':
+        # Channel mode: use channel_ids
+        training_channels = training_data[training_label]
+        if not training_channels:
+            print(f"Warning: No channels found for {training_label}")
+            return None
+        
+        # Select random channels using the configurable parameter
+        num_channels_to_select = min(len(training_channels), args.num_channels_per_ideology)
+        selected_channels = pd.Series(training_channels).sample(
+            n=num_channels_to_select, 
+            random_state=None  # Ensures truly random selection each time
+        ).to_list()
+        
+        print(f"  Selected {len(selected_channels)} random channels from {len(training_channels)} available for {training_label}")
+        
+        training_content = {
+            'type': 'channels',
+            'channels': selected_channels,
+            'videos_per_channel': args.num_videos_per_channel
+        }
+    else:
+        # Video mode: use video_ids
+        training_videos = training_data[training_label]
+        if not training_videos:
+            print(f"Warning: No videos found for {training_label}")
+            return None
+            
+        # Select random videos (* 2 for additional backups)
+        selected_videos = pd.Series(training_videos).sample(
+            min(len(training_videos), NUM_TRAINING_VIDEOS * 2)
+        ).to_list()
+        
+        training_content = {
+            'type': 'videos',
+            'videos': selected_videos[:NUM_TRAINING_VIDEOS],
+            'backup_videos': selected_videos[NUM_TRAINING_VIDEOS:]
+        }
+    
+    # Try test seeds
+    testSeed = choice(seeds)
+
+    # Generate a unique puppet identifier
+    puppetId = f'{training_label},{testSeed},{str(uuid4())[:8]}'
+
+    # Write arguments to a file
+    with open(os.path.join(ARGS_DIR, f'{puppetId}.json'), 'w') as f:
+        if args.mode == 'channels':
+            puppetArgs = dict(
+                puppetId=puppetId,
+                # Duration to watch each video
+                duration=WATCH_DURATION,
+                # A description with the search query
+                description=f'Sockpuppet {training_label} - analyzing "{search_query}"',
+                # Output directory for sock puppet
+                outputDir='/app/output',
+                # Steps to perform: train from channels then search
+                steps='train_channels,search',
+                # Channels file (use main CSV - sockpuppet.py will filter by ideology)
+                channelsFile='/app/data/chaines_clean.csv',
+                # Ideology filter for this sockpuppet
+                ideologyFilter=training_label,
+                # Number of channels to use (configurable)
+                maxChannels=args.num_channels_per_ideology,
+                # Videos per channel
+                videosPerChannel=args.num_videos_per_channel,
+                # Number of training videos (calculated)
+                trainingN=args.num_channels_per_ideology * args.num_videos_per_channel,
+                # Configurable search query
+                searchQuery=search_query,
+                # Configurable max search results
+                maxSearchResults=args.max_search_results,
+                # Configurable max recommendations
+                maxRecommendations=args.max_recommendations,
+                # Further queries searched by the same trained puppet, optionally from a fresh copy of the profile each
+                searchQueries=load_search_queries(args.search_queries_file) if args.search_queries_file else None,
+                searchReset=args.search_reset,
+                # Checkpoint progress next to the persistent profile so an interrupted run can resume
+                checkpoint=True,
+                # Video metadata cache shared by all puppets and the analysis
+                metadataCache='/app/output/metadata_cache.sqlite',
+                # Load the next channel's videos page in a background tab while watching
+                prefetchChannels=not args.no_channel_prefetch,
+                # Training watch speed and start position (recorded in the output as watch_mode)
+                playbackRate=args.playback_rate,
+                seekTo=args.seek_to,
+                # Keep thumbnails, fonts and trackers (slower, for full-fidelity runs)
+                fullPageLoad=args.full_page_load,
+                # Where results are read from: rendered page ('dom') or page data ('json')
+                extraction=args.extraction,
+                # Mode information
+                mode=args.mode
+            )
+        else:
+            # Original mode for compatibility
+            puppetArgs = dict(
+                puppetId=puppetId,
+                # Duration to watch each video
+                duration=WATCH_DURATION,
+                # A description
+                description=f'Sockpuppet {training_label} - Mode: {args.mode}',
+                # Output directory for sock puppet
+                outputDir='/app/output',
+                # Training content (channels or videos depending on mode)
+                training=training_content,
+                # Number of training items
+                trainingN=NUM_TRAINING_VIDEOS,
+                # Seed video
+                testSeed=testSeed,
+                # Steps to perform
+                steps='train,test',
+                # Training watch speed and start position (recorded in the output as watch_mode)
+                playbackRate=args.playback_rate,
+                seekTo=args.seek_to,
+                # Keep thumbnails, fonts and trackers (slower, for full-fidelity runs)
+                fullPageLoad=args.full_page_load,
+                # Where results are read from: rendered page ('dom') or page data ('json')
+                extraction=args.extraction,
+                # Mode information
+                mode=args.mode
+            )
+        puppetArgs.update(overrides)
+        # Explore the recommendation graph after collecting (not for profile-only trainers)
+        if args.crawl_depth and not puppetArgs['steps'].endswith('snapshot'):
+            puppetArgs.update(
+                steps=puppetArgs['steps'] + ',crawl',
+                crawlDepth=args.crawl_depth,
+                crawlBranching=args.crawl_branching,
+                crawlBudget=args.crawl_budget
+            )
+        json.dump(puppetArgs, f, indent=4)
+
+    return puppetId
+
+def make_orchestrator(args):
+    """Container orchestrator enforcing --max-containers and --puppet-timeout."""
+    timeout = args.puppet_timeout * 60 if args.puppet_timeout > 0 else None
+    return ContainerOrchestrator(docker.from_env(), args.max_containers, timeout=timeout,
+                                 log_dir=os.path.join(OUTPUT_DIR, 'logs'),
+                                 status_path=os.path.join(OUTPUT_DIR, 'containers.jsonl'),
+                                 labels={SOCKPUPPET_LABEL: 'true'})
+
+def launch_puppets(orchestrator, puppetIds, args):
+    """
+    Queue the container(s) running the given sockpuppets; they start as slots free up.
+
+    Puppets are packed --puppets-per-container at a time; a container running K
+    puppets gets K x (--puppet-memory + SPARE_BROWSER_MEMORY_MB) MB, and sockpuppet.py runs them concurrently.
+    """
+    per_container = max(1, args.puppets_per_container)
+    containers = []
+    for i in range(0, len(puppetIds), per_container):
+        batch = puppetIds[i:i + per_container]
+        print("Spawning container...")
+
+        # Set outputDir as "/app/output"
+        command = ['python', 'sockpuppet.py'] + [f'/app/arguments/{puppetId}.json' for puppetId in batch]
+        run_options = dict(shm_size='512M')
+        if len(batch) > 1:
+            # Plus the warm spare browser of each puppet's worker
+            memory_mb = len(batch) * (args.puppet_memory + SPARE_BROWSER_MEMORY_MB)
+            command += ['--memory-budget', str(memory_mb), '--puppet-memory', str(args.puppet_memory)]
+            run_options = dict(shm_size=f'{512 * len(batch)}M', mem_limit=f'{memory_mb}m')
+
+        # Run the container - like manual command but in parallel
+        training_label = batch[0].split(',')[0] if len(batch) == 1 else 'batch'
+        container_name = f'sockpuppet_{training_label.lower()}_{str(uuid4())[:8]}'
+        print(f"Queueing container {container_name} with {len(batch)} puppet(s)...")
+        
+        # Starts once fewer than --max-containers are running; logs go to output/logs/
+        container = orchestrator.run(
+            IMAGE_NAME, 
+            command, 
+            name=container_name,
+            puppets=batch,
+            volumes=get_mount_volumes(), 
+            **run_options
+        )
+        containers.append(container)
+    return containers
+
+def spawn_containers(args):
+    training_data = load_training_data(args)
+    seeds = load_seeds(args)
     
     # Display global configuration summary
     print(f"\n{'='*60}")
     print(f"YOUTUBE SOCKPUPPET ANALYSIS CONFIGURATION")
     print(f"{'='*60}")
-    print(f"Search Query: '{args.search_query}'")
+    queries = load_search_queries(args.search_queries_file) if args.search_queries_file else [args.search_query]
+    print(f"Search Queries: {queries}" if len(queries) > 1 else f"Search Query: '{queries[0]}'")
     print(f"Training Mode: {args.mode}")
     print(f"Channels per Ideology: {args.num_channels_per_ideology}")
     print(f"Videos per Channel: {args.num_videos_per_channel}")
@@ -178,6 +382,7 @@ def spawn_containers(args):
     
     # Spawn containers for each user
     count = 0
+    puppetIds = []
 
     # Create required directories
     if not os.path.exists(ARGS_DIR):
@@ -192,149 +397,256 @@ def spawn_containers(args):
 
         # Display configuration for this ideology
         print(f"  Configuration:")
-        print(f"    - Search query: '{args.search_query}'")
+        print(f"    - Search queries: {queries}")
         print(f"    - Channels per ideology: {args.num_channels_per_ideology}")
         print(f"    - Videos per channel: {args.num_videos_per_channel}")
         print(f"    - Max search results: {args.max_search_results}")
         print(f"    - Max recommendations: {args.max_recommendations}")
 
-        # User data for training based on mode
-        if args.mode == 'channels':
-            # Channel mode: use channel_ids
-            training_channels = training_data[training_label]
-            if not training_channels:
-                print(f"Warning: No channels found for {training_label}")
+        puppetId = write_puppet_args(args, training_label, training_data, seeds, queries[0])
+        if puppetId is None:
+            continue
+
+        puppetIds.append(puppetId)
+        # Increment count of puppets
+        count += 1
+
+    # Spawn containers if it's not a simulation
+    if not args.simulate:
+        # Waits for the containers on exit; on Ctrl-C kills them instead
+        with make_orchestrator(args) as orchestrator:
+            containers = launch_puppets(orchestrator, puppetIds, args)
+            print("Total containers spawned:", len(containers))
+            print("Waiting for containers to exit...")
+    print("Total sockpuppets:", count)
+
+# ========================================
+# EXPERIMENT MATRIX
+# ========================================
+# A spec expands into cells (ideology x query x replicate). Each attempt at a
+# cell is recorded in output/experiments/<name>.json before its container is
+# started; a cell is complete once output/puppets/<puppetId> exists for one of
+# its attempts, so re-running the same spec only launches the missing cells.
+
+# Spec keys that override the corresponding command line arguments
+MATRIX_OVERRIDES = ['mode', 'num_channels_per_ideology', 'num_videos_per_channel', 'max_search_results', 'max_recommendations', 'full_page_load', 'extraction', 'playback_rate', 'seek_to', 'crawl_depth', 'crawl_branching', 'crawl_budget', 'search_reset']
+
+def load_matrix_spec(path):
+    """
+    Read an experiment spec, e.g.
+        {"name": "protests-2025", "queries": ["gilet jaune", "manifestation agriculteurs"],
+         "replicates": 5, "ideologies": ["Left", "Right"], "num_channels_per_ideology": 5}
+    """
+    with open(path) as f:
+        spec = json.load(f)
+    if not spec.get('queries'):
+        raise ValueError(f"Experiment spec {path} has no 'queries'")
+    spec.setdefault('name', os.path.splitext(os.path.basename(path))[0])
+    spec.setdefault('replicates', 1)
+    spec.setdefault('ideologies', LABELS)
+    unknown = set(spec['ideologies']) - set(LABELS)
+    if unknown:
+        raise ValueError(f"Unknown ideologies in spec: {sorted(unknown)}")
+    return spec
+
+def cell_key(ideology, query, replicate):
+    return f'{ideology}|{query}|{replicate}'
+
+def expand_matrix(spec):
+    """Work queue of cells, replicate-major so partial runs stay balanced across ideologies and queries."""
+    return [
+        dict(ideology=ideology, query=query, replicate=replicate)
+        for replicate in range(spec['replicates'])
+        for query in spec['queries']
+        for ideology in spec['ideologies']
+    ]
+
+def matrix_batches(cells, batch_queries=False):
+    """
+    Group cells run by the same puppet: with batch_queries, one puppet per
+    (ideology, replicate) searches all of its missing queries; otherwise one per cell.
+    """
+    if not batch_queries:
+        return [[cell] for cell in cells]
+    batches = {}
+    for cell in cells:
+        batches.setdefault((cell['ideology'], cell['replicate']), []).append(cell)
+    return list(batches.values())
+
+def load_matrix_state(name):
+    path = os.path.join(EXPERIMENTS_DIR, f'{name}.json')
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return dict(name=name, cells={})
+
+def save_matrix_state(state):
+    """Write atomically so a crash never leaves a truncated state file."""
+    if not os.path.exists(EXPERIMENTS_DIR):
+        os.makedirs(EXPERIMENTS_DIR)
+    path = os.path.join(EXPERIMENTS_DIR, f"{state['name']}.json")
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+def cell_completed(cell_state):
+    return any(os.path.exists(os.path.join(OUTPUT_DIR, 'puppets', puppetId)) for puppetId in cell_state.get('attempts', []))
+
+def resumable_attempt(cell_state):
+    """Last attempt of a cell if it was interrupted after writing a checkpoint (it resumes under the same puppetId)."""
+    attempts = cell_state.get('attempts', [])
+    if attempts and os.path.exists(os.path.join(OUTPUT_DIR, 'profiles', f'{attempts[-1]}.checkpoint.json')):
+        return attempts[-1]
+    return None
+
+def matrix_progress(spec, state):
+    """Number of completed cells out of the total."""
+    cells = expand_matrix(spec)
+    done = sum(cell_completed(state['cells'].get(cell_key(**cell), {})) for cell in cells)
+    return done, len(cells)
+
+def trainer_key(ideology, replicate):
+    return f'{ideology}|{replicate}'
+
+def trainer_snapshot(trainerId):
+    """Host path of the profile snapshot written by a training puppet."""
+    return os.path.join(OUTPUT_DIR, 'snapshots', trainerId)
+
+def completed_trainer(state, ideology, replicate):
+    """puppetId of a training puppet with a complete snapshot for this (ideology, replicate), if any."""
+    attempts = state['trainers'].get(trainer_key(ideology, replicate), [])
+    return next((trainerId for trainerId in reversed(attempts) if is_complete(trainer_snapshot(trainerId))), None)
+
+def write_train_once_cells(args, state, missing, training_data, seeds, orchestrator):
+    """
+    Train one puppet per (ideology, replicate) and snapshot its profile, then
+    start one search-only puppet per query from a copy of that snapshot.
+    Returns the puppetIds of the search puppets to launch.
+    """
+    state.setdefault('trainers', {})
+    trainers = sorted({(cell['ideology'], cell['replicate']) for cell in missing}, key=lambda t: (t[1], t[0]))
+
+    trainerIds = []
+    for ideology, replicate in trainers:
+        if completed_trainer(state, ideology, replicate):
+            continue
+        resumed = resumable_attempt(dict(attempts=state['trainers'].get(trainer_key(ideology, replicate), [])))
+        if resumed:
+            print(f"Resuming interrupted training puppet {resumed}")
+            trainerIds.append(resumed)
+            continue
+        print(f"Training puppet for {trainer_key(ideology, replicate)}")
+        trainerId = write_puppet_args(args, ideology, training_data, seeds, '',
+                                      steps='train_channels,snapshot',
+                                      description=f'Sockpuppet {ideology} - training snapshot')
+        if trainerId is None:
+            continue
+        state['trainers'].setdefault(trainer_key(ideology, replicate), []).append(trainerId)
+        save_matrix_state(state)
+        trainerIds.append(trainerId)
+
+    if orchestrator and trainerIds:
+        launch_puppets(orchestrator, trainerIds, args)
+        print(f"Waiting for {len(trainerIds)} training puppets to snapshot their profiles...")
+        orchestrator.wait_all()
+
+    puppetIds = []
+    for cell in missing:
+        trainerId = completed_trainer(state, cell['ideology'], cell['replicate'])
+        if trainerId is None and args.simulate:
+            trainerId = state['trainers'].get(trainer_key(cell['ideology'], cell['replicate']), [None])[-1]
+        if trainerId is None:
+            print(f"No trained snapshot for cell {cell_key(**cell)}, skipping")
+            continue
+        resumed = resumable_attempt(state['cells'].get(cell_key(**cell), {}))
+        if resumed:
+            puppetIds.append(resumed)
+            continue
+        puppetId = write_puppet_args(args, cell['ideology'], training_data, seeds, cell['query'],
+                                     steps='search', baseSnapshot=f'/app/output/snapshots/{trainerId}', trainerId=trainerId)
+        cell_state = state['cells'].setdefault(cell_key(**cell), dict(cell, attempts=[]))
+        cell_state['attempts'].append(puppetId)
+        save_matrix_state(state)
+        puppetIds.append(puppetId)
+    return puppetIds
+
+def run_matrix(args):
+    spec = load_matrix_spec(args.matrix)
+    # Queries come from the spec
+    args.search_queries_file = None
+    for key in MATRIX_OVERRIDES:
+        if key in spec:
+            setattr(args, key, spec[key])
+
+    state = load_matrix_state(spec['name'])
+    state['spec'] = spec
+    cells = expand_matrix(spec)
+    missing = [cell for cell in cells if not cell_completed(state['cells'].get(cell_key(**cell), {}))]
+
+    print(f"\n{'='*60}")
+    print(f"EXPERIMENT MATRIX: {spec['name']}")
+    print(f"{'='*60}")
+    print(f"Queries: {spec['queries']}")
+    print(f"Ideologies: {', '.join(spec['ideologies'])}")
+    print(f"Replicates: {spec['replicates']}")
+    print(f"Train once, search many: {bool(spec.get('train_once'))}")
+    print(f"All queries in one puppet: {bool(spec.get('batch_queries'))}")
+    print(f"Cells: {len(cells)} total, {len(cells) - len(missing)} completed, {len(missing)} to run")
+    print(f"Max concurrent containers: {args.max_containers}")
+    print(f"{'='*60}\n")
+
+    for d in [ARGS_DIR, OUTPUT_DIR]:
+        if not os.path.exists(d):
+            os.makedirs(d)
+
+    training_data = load_training_data(args)
+    seeds = load_seeds(args)
+
+    orchestrator = make_orchestrator(args) if not args.simulate else None
+
+    # Closing waits for the containers; an exception or Ctrl-C kills them instead
+    with orchestrator or nullcontext():
+        puppetIds = []
+        if spec.get('train_once'):
+            puppetIds = write_train_once_cells(args, state, missing, training_data, seeds, orchestrator)
+            missing = []
+        batches = matrix_batches(missing, spec.get('batch_queries'))
+        for i, batch in enumerate(batches):
+            keys = [cell_key(**cell) for cell in batch]
+            print(f"[{i + 1}/{len(batches)}] Cell {', '.join(keys)}")
+            # Batches are re-formed from the missing cells, so their interrupted attempts may differ
+            resumed = {key: resumable_attempt(state['cells'].get(key, {})) for key in keys}
+            for puppetId in resumed.values():
+                if puppetId and puppetId not in puppetIds:
+                    print(f"  Resuming interrupted puppet {puppetId}")
+                    puppetIds.append(puppetId)
+            batch = [cell for cell, key in zip(batch, keys) if not resumed[key]]
+            keys = [key for key in keys if not resumed[key]]
+            if not batch:
                 continue
-            
-            # Select random channels using the configurable parameter
-            num_channels_to_select = min(len(training_channels), args.num_channels_per_ideology)
-            selected_channels = pd.Series(training_channels).sample(
-                n=num_channels_to_select, 
-                random_state=None  # Ensures truly random selection each time
-            ).to_list()
-            
-            print(f"  Selected {len(selected_channels)} random channels from {len(training_channels)} available for {training_label}")
-            
-            training_content = {
-                'type': 'channels',
-                'channels': selected_channels,
-                'videos_per_channel': args.num_videos_per_channel
-            }
-        else:
-            # Video mode: use video_ids
-            training_videos = training_data[training_label]
-            if not training_videos:
-                print(f"Warning: No videos found for {training_label}")
+            queries = [cell['query'] for cell in batch]
+            overrides = dict(searchQueries=queries) if len(queries) > 1 else {}
+            puppetId = write_puppet_args(args, batch[0]['ideology'], training_data, seeds, queries[0], **overrides)
+            if puppetId is None:
                 continue
-                
-            # Select random videos (* 2 for additional backups)
-            selected_videos = pd.Series(training_videos).sample(
-                min(len(training_videos), NUM_TRAINING_VIDEOS * 2)
-            ).to_list()
-            
-            training_content = {
-                'type': 'videos',
-                'videos': selected_videos[:NUM_TRAINING_VIDEOS],
-                'backup_videos': selected_videos[NUM_TRAINING_VIDEOS:]
-            }
-        
-        # Check for running container list
-        if not args.simulate:
-            while max_containers_reached(client, args.max_containers):
-                # Sleep for a minute if maxContainers are active
-                print("Max containers reached. Sleeping...")
-                sleep(args.sleep_duration)
-
-
-        # Try test seeds
-        testSeed = choice(seeds)
-
-        # Generate a unique puppet identifier
-        puppetId = f'{training_label},{testSeed},{str(uuid4())[:8]}'
-
-        # Write arguments to a file
-        with open(os.path.join(ARGS_DIR, f'{puppetId}.json'), 'w') as f:
-            if args.mode == 'channels':
-                puppetArgs = dict(
-                    puppetId=puppetId,
-                    # Duration to watch each video
-                    duration=WATCH_DURATION,
-                    # A description with the search query
-                    description=f'Sockpuppet {training_label} - analyzing "{args.search_query}"',
-                    # Output directory for sock puppet
-                    outputDir='/app/output',
-                    # Steps to perform: train from channels then search
-                    steps='train_channels,search',
-                    # Channels file (use main CSV - sockpuppet.py will filter by ideology)
-                    channelsFile='/app/data/chaines_clean.csv',
-                    # Ideology filter for this sockpuppet
-                    ideologyFilter=training_label,
-                    # Number of channels to use (configurable)
-                    maxChannels=args.num_channels_per_ideology,
-                    # Videos per channel
-                    videosPerChannel=args.num_videos_per_channel,
-                    # Number of training videos (calculated)
-                    trainingN=args.num_channels_per_ideology * args.num_videos_per_channel,
-                    # Configurable search query
-                    searchQuery=args.search_query,
-                    # Configurable max search results
-                    maxSearchResults=args.max_search_results,
-                    # Configurable max recommendations
-                    maxRecommendations=args.max_recommendations,
-                    # Mode information
-                    mode=args.mode
-                )
-            else:
-                # Original mode for compatibility
-                puppetArgs = dict(
-                    puppetId=puppetId,
-                    # Duration to watch each video
-                    duration=WATCH_DURATION,
-                    # A description
-                    description=f'Sockpuppet {training_label} - Mode: {args.mode}',
-                    # Output directory for sock puppet
-                    outputDir='/app/output',
-                    # Training content (channels or videos depending on mode)
-                    training=training_content,
-                    # Number of training items
-                    trainingN=NUM_TRAINING_VIDEOS,
-                    # Seed video
-                    testSeed=testSeed,
-                    # Steps to perform
-                    steps='train,test',
-                    # Mode information
-                    mode=args.mode
-                )
-            json.dump(puppetArgs, f, indent=4)
-
-
-        # Spawn container if it's not a simulation
-        if not args.simulate:
-            print("Spawning container...")
-
-            # Set outputDir as "/app/output"
-            command = ['python', 'sockpuppet.py', f'/app/arguments/{puppetId}.json']
-
-            # Run the container - like manual command but in parallel
-            container_name = f'sockpuppet_{training_label.lower()}_{str(uuid4())[:8]}'
-            print(f"Launching container {container_name}...")
-            
-            client.containers.run(
-                IMAGE_NAME, 
-                command, 
-                volumes=get_mount_volumes(), 
-                shm_size='512M', 
-                remove=True, 
-                name=container_name,
-                detach=True  # Parallel as desired
-            )
-            
-            print(f"Container {training_label} launched in parallel.")
-            
-        # Increment count of containers
-        count += 1
 
-    print("Total containers spawned:", count)
+            # Record the attempt before launching so a crash cannot orphan it
+            for cell, key in zip(batch, keys):
+                cell_state = state['cells'].setdefault(key, dict(cell, attempts=[]))
+                cell_state['attempts'].append(puppetId)
+            save_matrix_state(state)
+            puppetIds.append(puppetId)
+
+        if orchestrator:
+            launch_puppets(orchestrator, puppetIds, args)
+            print("All cells queued, waiting for containers to exit...")
+            orchestrator.wait_all()
+    done, total = matrix_progress(spec, state)
+    print(f"Experiment {spec['name']}: {done}/{total} cells completed")
+    if done < total:
+        print(f"Re-run with --matrix {args.matrix} to resume the {total - done} missing cells")
 
 def main():
 
@@ -345,10 +657,12 @@ def main():
         build_image()
         print("Build complete!")
 
-    if args.run or args.simulate:
+    if args.matrix:
+        run_matrix(args)
+    elif args.run or args.simulate:
         spawn_containers(args)
 
-    if not args.build and not args.run and not args.simulate:
+    if not args.build and not args.run and not args.simulate and not args.matrix:
         parser.print_help()
 
 
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark of EYTDriver and sockpuppet steps on the local fixture
+
+Starts examples/mock_youtube.py, points the driver at it (EYT_YOUTUBE_URL) and
+times each driver operation (consent, homepage, search, scrolled search,
+channel videos, prefetched channel, watch, up next) over several rounds, then
+runs the sockpuppet 'train_channels' and 'search' steps on the same browser.
+For every operation it reports the median/p90 latency, the WebDriver commands
+sent (round trips to chromedriver) and the pages served per minute. No access
+to YouTube is needed, only Chrome and chromedriver.
+
+Usage:
+    python examples/benchmark_driver.py [--rounds N] [--extraction dom|json] [--latency S] [--no-puppet]
+"""
+import contextlib
+import csv
+import io
+import os
+import statistics
+import sys
+import tempfile
+from argparse import ArgumentParser
+from collections import Counter
+from time import monotonic
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mock_youtube import MockYouTube, channel_handle
+
+# Requests of the fixture that are not page loads
+NOT_PAGES = ('continuation', 'not_found')
+
+
+class CommandCounter:
+    """Counts the WebDriver commands a selenium driver sends, by command name."""
+
+    def __init__(self, webdriver):
+        self.counts = Counter()
+        execute = webdriver.execute
+
+        def counted(command, params=None):
+            self.counts[command] += 1
+            return execute(command, params)
+
+        # Every command (find, script, click, navigation...) goes through execute()
+        webdriver.execute = counted
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+class Benchmark:
+    """Latency, WebDriver commands and pages served of each run of each operation."""
+
+    def __init__(self, driver, fixture):
+        self.driver = driver
+        self.fixture = fixture
+        self.commands = CommandCounter(driver.driver)
+        # name -> [(seconds, commands, pages)]
+        self.runs = {}
+
+    def pages_served(self):
+        return sum(n for page, n in self.fixture.requests.items() if page not in NOT_PAGES)
+
+    def measure(self, name, function, *args, **kwargs):
+        commands = self.commands.total
+        pages = self.pages_served()
+        start = monotonic()
+        result = function(*args, **kwargs)
+        self.runs.setdefault(name, []).append((monotonic() - start, self.commands.total - commands, self.pages_served() - pages))
+        return result
+
+    def report(self):
+        print(f"{'operation':22s} {'runs':>4s} {'median s':>9s} {'p90 s':>7s} {'commands':>9s} {'pages/min':>10s}")
+        for name, runs in self.runs.items():
+            seconds = sorted(run[0] for run in runs)
+            p90 = seconds[min(len(seconds) - 1, int(0.9 * len(seconds)))]
+            commands = statistics.mean(run[1] for run in runs)
+            pages_per_minute = sum(run[2] for run in runs) / max(sum(seconds), 1e-9) * 60
+            print(f"{name:22s} {len(runs):4d} {statistics.median(seconds):9.3f} {p90:7.3f} {commands:9.1f} {pages_per_minute:10.1f}")
+        total = sum(run[0] for runs in self.runs.values() for run in runs)
+        pages = sum(run[2] for runs in self.runs.values() for run in runs)
+        print(f"Total: {self.commands.total} WebDriver commands, {pages} pages in {total:.1f}s ({pages / max(total, 1e-9) * 60:.1f} pages/min)")
+        print("Most frequent commands: " + ', '.join(f'{command} {n}' for command, n in self.commands.counts.most_common(6)))
+
+
+def driver_operations(bench, rounds, watch_duration):
+    driver = bench.driver
+
+    def channel_videos(handle):
+        driver.go_to_channel_from_handle(handle)
+        return driver.watch_top_video()
+
+    # First page load of the fresh profile: the consent dialog is shown and accepted
+    bench.measure('consent', driver.get, bench.fixture.url)
+    for i in range(rounds):
+        bench.measure('homepage', driver.get_homepage_recommendations, max_results=20)
+        results = bench.measure('search', driver.search_videos, f'benchmark query {i}', max_results=20)
+        bench.measure('search_scroll', driver.search_videos, f'benchmark scroll {i}', max_results=3 * bench.fixture.results_per_page)
+
+        bench.measure('channel_videos', channel_videos, channel_handle(i))
+        tab = driver.prefetch_channel_videos(channel_handle(i + 1))
+        bench.measure('prefetched_channel', driver.top_videos_from_tab, tab)
+
+        # Back to a search results page so the watch starts with a click, as in the puppets
+        results = driver.search_videos(f'benchmark query {i}', max_results=1) or results
+        if results:
+            bench.measure('watch', driver.play, results[0], duration=watch_duration)
+            bench.measure('up_next', driver.get_upnext_recommendations, topn=10)
+
+
+def puppet_steps(bench, extraction, watch_duration, output_dir, verbose=False):
+    """Run the sockpuppet training and search steps on the benchmark's browser (one puppet per step)."""
+    import sockpuppet
+
+    channels_file = os.path.join(output_dir, 'channels.csv')
+    with open(channels_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['id', 'id_ytb', 'idee_pol'])
+        for k in range(3):
+            writer.writerow([f'Mock channel {k}', channel_handle(k), 'gauche'])
+
+    for step in ['train_channels', 'search']:
+        puppet_args = dict(
+            puppetId=f'benchmark_{step}', duration=watch_duration, description=f'Benchmark {step}', outputDir=output_dir,
+            steps=step, channelsFile=channels_file, ideologyFilter='Left', maxChannels=3, videosPerChannel=2, trainingN=6,
+            searchQuery='benchmark puppet', maxSearchResults=20, maxRecommendations=10, extraction=extraction
+        )
+        with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+            bench.measure(f'puppet_{step}', sockpuppet.run_puppet, puppet_args, bench.driver)
+        if not os.path.exists(os.path.join(output_dir, 'puppets', puppet_args['puppetId'])):
+            print(f"Puppet step {step} failed, see {os.path.join(output_dir, 'exceptions')}")
+
+
+def main():
+    parser = ArgumentParser(description='Benchmark EYTDriver and sockpuppet steps against a local YouTube fixture')
+    parser.add_argument('--rounds', type=int, default=5, help='Runs of each driver operation')
+    parser.add_argument('--extraction', choices=['dom', 'json'], default='dom', help='Result extraction mode of the driver')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds added by the fixture to every response')
+    parser.add_argument('--ad-rate', type=float, default=0.5, help='Fraction of watch pages starting with an ad')
+    parser.add_argument('--watch-duration', type=int, default=8, help='Seconds of video per watch (fixture clock runs 4x faster)')
+    parser.add_argument('--no-puppet', action='store_true', help='Only benchmark driver operations')
+    parser.add_argument('--verbose', action='store_true', help='Show driver and puppet logs')
+    cli = parser.parse_args()
+
+    with MockYouTube(latency=cli.latency, ad_rate=cli.ad_rate) as fixture, tempfile.TemporaryDirectory() as output_dir:
+        # The driver reads the site root when imported
+        os.environ['EYT_YOUTUBE_URL'] = fixture.url
+        from EYTDriver import EYTDriver
+
+        print(f"Fixture at {fixture.url} (latency {cli.latency}s), extraction '{cli.extraction}'")
+        start = monotonic()
+        driver = EYTDriver(browser='chrome', headless=True, verbose=cli.verbose, extraction=cli.extraction)
+        print(f"Browser started in {monotonic() - start:.1f}s")
+        bench = Benchmark(driver, fixture)
+        try:
+            driver_operations(bench, cli.rounds, cli.watch_duration)
+            if not cli.no_puppet:
+                puppet_steps(bench, cli.extraction, cli.watch_duration, output_dir, cli.verbose)
+        finally:
+            driver.quit()
+        bench.report()
+        print(f"Requests served: {dict(fixture.requests)}")
+
+
+if __name__ == '__main__':
+    main()
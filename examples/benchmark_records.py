@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark of the video record classes
+
+Compares the slotted Video / VideoMetadata / VideoBatch of EYTDriver with the
+previous dict-based classes (reproduced below) on synthetic recommendation
+records. No browser or network needed.
+
+Usage:
+    python examples/benchmark_records.py [num_records]
+"""
+import os
+import re
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from EYTDriver import Video, VideoMetadata, VideoBatch
+
+
+class LegacyVideoMetadata:
+    """VideoMetadata before slots: one attribute dict per instance plus the raw yt-dlp dict."""
+    def __init__(self, video_json):
+        for attribute, key, default in VideoMetadata.FIELDS:
+            setattr(self, attribute, video_json.get(key, default))
+        self.video_json = video_json
+
+
+class LegacyVideo:
+    """Video before slots."""
+    def __init__(self, elem, url):
+        self.elem = elem
+        self.url = url
+        match = re.search(r'[?&]v=(.*?)(?:&|$)', url)
+        self.videoId = match.group(1) if match else ''
+        self.__metadata = None
+
+
+def fake_info(i):
+    """A yt-dlp-like info dict (real ones also carry formats, thumbnails, subtitles...)."""
+    return dict(
+        id=f'vid{i:08d}', title=f'Video {i}', webpage_url=f'https://www.youtube.com/watch?v=vid{i:08d}',
+        duration=i % 900, thumbnail=f'https://i.ytimg.com/vi/vid{i:08d}/hq.jpg', description='lorem ipsum ' * 20,
+        upload_date='20250101', channel_id=f'UC{i % 500:022d}', channel_url='https://www.youtube.com/channel/x',
+        age_limit=0, uploader=f'Channel {i % 500}', view_count=i * 10, like_count=i, comment_count=i // 10,
+        average_rating=None, categories=['News & Politics'], tags=['tag1', 'tag2', 'tag3'],
+        formats=[dict(format_id=str(f), url=f'https://rr.googlevideo.com/{i}/{f}', ext='mp4', tbr=f * 100.0) for f in range(20)],
+        thumbnails=[dict(url=f'https://i.ytimg.com/vi/vid{i:08d}/{t}.jpg', width=t * 100) for t in range(10)],
+    )
+
+
+def measure(build):
+    """Bytes still allocated by the objects `build()` returns."""
+    tracemalloc.start()
+    objects = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    # Recommendation records repeat a limited set of videos
+    urls = [f'https://www.youtube.com/watch?v=vid{i % (n // 10):08d}&pp=rec' for i in range(n)]
+    infos = [fake_info(i) for i in range(n // 10)]
+
+    results = [
+        ('Video (legacy)', measure(lambda: [LegacyVideo(None, url) for url in urls])),
+        ('Video (slots)', measure(lambda: [Video(None, url, rank=i % 20 + 1) for i, url in enumerate(urls)])),
+        ('VideoBatch', measure(lambda: VideoBatch(Video(None, url, rank=i % 20 + 1) for i, url in enumerate(urls)))),
+        ('VideoMetadata (legacy, raw json kept)', measure(lambda: [LegacyVideoMetadata(dict(info)) for info in infos])),
+        ('VideoMetadata (slots, raw json dropped)', measure(lambda: [VideoMetadata(dict(info)) for info in infos])),
+    ]
+
+    print(f"{n} video references, {n // 10} metadata records")
+    for name, size in results:
+        print(f"  {name:42s} {size / 1024 / 1024:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Local HTTP fixture imitating the YouTube pages EYTDriver reads
+
+Serves synthetic, deterministic versions of the homepage, search results,
+channel pages (/@handle, /@handle/videos with a 'Popular' chip), watch pages
+(a scripted #movie_player with pre-roll ads and a skip button, up-next
+yt-lockup-view-model recommendations rendered after the page) and the GDPR
+consent dialog, using the same markup and ytInitialData structure as the
+selectors and parsers of EYTDriver. Infinite-scroll pages load their next
+batch from the server when scrolled to the bottom.
+
+The driver is pointed at it through EYT_YOUTUBE_URL (set before importing
+EYTDriver). The player's clock runs `time_scale` times faster than real time
+so watches do not dominate benchmarks (keep it below 8: larger jumps between
+two player polls are taken for seeks).
+
+Usage:
+    python examples/mock_youtube.py [port]
+"""
+import html
+import json
+import sys
+import threading
+import zlib
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from time import sleep
+from urllib.parse import urlparse, parse_qs, quote
+
+CATALOG_SIZE = 10_000
+NUM_CHANNELS = 50
+
+
+def video_id(n):
+    return f'mock{n % CATALOG_SIZE:07d}'
+
+
+def video_number(vid):
+    try:
+        return int(vid[4:])
+    except ValueError:
+        return zlib.crc32(vid.encode()) % CATALOG_SIZE
+
+
+def channel_handle(k):
+    return f'@mockchannel{k}'
+
+
+def video_record(n):
+    n %= CATALOG_SIZE
+    length = 60 + (n * 37) % 900
+    return dict(videoId=video_id(n), title=f'Mock video {n}', channel=f'Mock channel {n % NUM_CHANNELS}',
+                handle=channel_handle(n % NUM_CHANNELS), length=length, duration=f'{length // 60}:{length % 60:02d}')
+
+
+STYLE = """
+body { margin: 0; font-family: sans-serif; }
+ytd-video-renderer, ytd-rich-item-renderer, yt-lockup-view-model { display: block; height: 120px; }
+ytd-continuation-item-renderer { display: block; height: 40px; }
+#consent { position: fixed; inset: 0; background: rgba(0, 0, 0, .6); }
+#movie_player { position: relative; width: 640px; height: 360px; background: #000; }
+.ytp-skip-ad-button { position: absolute; right: 0; bottom: 40px; }
+"""
+
+CONSENT_HTML = """
+<ytd-consent-bump-v2-lightbox id="consent" role="dialog">
+  <button onclick="document.cookie = 'CONSENT=YES+; path=/'; location.reload();"><span>Accept all</span></button>
+  <button><span>Reject all</span></button>
+</ytd-consent-bump-v2-lightbox>
+"""
+
+# Appends the next batch of renderers (HTML fragment from the server) when the
+# page is scrolled to the bottom, like YouTube's continuation items
+CONTINUATION_JS = """
+(() => {
+  const container = document.getElementById('contents');
+  let page = 1;
+  let loading = false;
+  window.addEventListener('scroll', () => {
+    const marker = document.querySelector('ytd-continuation-item-renderer');
+    if (!marker || loading || window.innerHeight + window.scrollY < document.documentElement.scrollHeight - 200) return;
+    loading = true;
+    fetch(container.dataset.more + '&page=' + page).then(response => response.text().then(fragment => {
+      marker.insertAdjacentHTML('beforebegin', fragment);
+      if (response.headers.get('X-More') !== '1') marker.remove();
+      page++;
+      loading = false;
+    }));
+  });
+})();
+"""
+
+# Scripted player: a <video> whose clock, pause state and rate are simulated,
+# with an optional pre-roll ad ('ad-showing' class, skip button after skipAfter s)
+PLAYER_JS = """
+(() => {
+  const config = window.mockPlayerConfig;
+  const player = document.getElementById('movie_player');
+  const video = player.querySelector('video');
+  const button = player.querySelector('.ytp-play-button');
+  const skip = player.querySelector('.ytp-skip-ad-button');
+  let time = 0, rate = 1, playing = false, ended = false, last = performance.now();
+  const tick = () => {
+    const now = performance.now();
+    if (playing && !player.classList.contains('ad-showing')) {
+      time += (now - last) / 1000 * rate * config.timeScale;
+      if (time >= config.length) { time = config.length; ended = true; playing = false; }
+    }
+    last = now;
+  };
+  const update = () => { button.title = playing ? 'Pause (k)' : 'Play (k)'; };
+  Object.defineProperties(video, {
+    currentTime: {get: () => { tick(); return time; }, set: value => { tick(); time = value; ended = false; }},
+    paused: {get: () => { tick(); return !playing; }},
+    ended: {get: () => { tick(); return ended; }},
+    duration: {get: () => config.length},
+    playbackRate: {get: () => rate, set: value => { tick(); rate = value; }},
+  });
+  video.play = () => { tick(); playing = !ended; update(); return Promise.resolve(); };
+  video.pause = () => { tick(); playing = false; update(); };
+  player.playVideo = () => video.play();
+  player.pauseVideo = () => video.pause();
+  player.seekTo = seconds => { video.currentTime = seconds; };
+  player.getPlayerResponse = () => window.ytInitialPlayerResponse;
+  button.addEventListener('click', () => playing ? video.pause() : video.play());
+
+  const endAd = () => {
+    if (!player.classList.contains('ad-showing')) return;
+    tick();
+    skip.style.display = 'none';
+    player.classList.remove('ad-showing');
+  };
+  if (config.adSeconds > 0) {
+    player.classList.add('ad-showing');
+    setTimeout(() => { if (player.classList.contains('ad-showing')) skip.style.display = ''; }, config.skipAfter * 1000);
+    setTimeout(endAd, config.adSeconds * 1000);
+    skip.addEventListener('click', endAd);
+  }
+  // Autoplay
+  video.play();
+
+  // Up next renders after the page, like YouTube's lazy secondary results
+  setTimeout(() => {
+    document.querySelector('ytd-watch-next-secondary-results-renderer').innerHTML = config.recommendations;
+  }, config.recommendationsDelay * 1000);
+})();
+"""
+
+
+def search_renderer(video):
+    return (f'<ytd-video-renderer><a id="video-title" href="/watch?v={video["videoId"]}" title="{html.escape(video["title"])}">'
+            f'{html.escape(video["title"])}</a><ytd-channel-name><a href="/{video["handle"]}">{html.escape(video["channel"])}</a>'
+            f'</ytd-channel-name><ytd-thumbnail-overlay-time-status-renderer><span id="text">{video["duration"]}</span>'
+            f'</ytd-thumbnail-overlay-time-status-renderer></ytd-video-renderer>')
+
+
+def rich_item_renderer(video):
+    return (f'<ytd-rich-item-renderer><div id="dismissible"><a id="video-title-link" href="/watch?v={video["videoId"]}" '
+            f'title="{html.escape(video["title"])}">{html.escape(video["title"])}</a>'
+            f'<div id="channel-name">{html.escape(video["channel"])}</div>'
+            f'<span class="badge-shape-wiz__text">{video["duration"]}</span></div></ytd-rich-item-renderer>')
+
+
+def lockup_view_model(video):
+    return (f'<yt-lockup-view-model><a href="/watch?v={video["videoId"]}" class="yt-lockup-view-model__content-image">'
+            f'<span class="yt-badge-shape__text">{video["duration"]}</span></a>'
+            f'<h3 class="yt-lockup-metadata-view-model__title">{html.escape(video["title"])}</h3>'
+            f'<span class="yt-content-metadata-view-model__metadata-text">{html.escape(video["channel"])}</span>'
+            f'</yt-lockup-view-model>')
+
+
+def video_renderer_data(video):
+    return dict(videoRenderer=dict(videoId=video['videoId'], title=dict(runs=[dict(text=video['title'])]),
+                                   ownerText=dict(runs=[dict(text=video['channel'])]), lengthText=dict(simpleText=video['duration'])))
+
+
+def lockup_data(video):
+    return dict(lockupViewModel=dict(
+        contentId=video['videoId'], contentType='LOCKUP_CONTENT_TYPE_VIDEO',
+        contentImage=dict(thumbnailViewModel=dict(overlays=[dict(thumbnailOverlayBadgeViewModel=dict(
+            thumbnailBadges=[dict(thumbnailBadgeViewModel=dict(text=video['duration']))]))])),
+        metadata=dict(lockupMetadataViewModel=dict(
+            title=dict(content=video['title']),
+            metadata=dict(contentMetadataViewModel=dict(metadataRows=[dict(metadataParts=[dict(text=dict(content=video['channel']))])]))))
+    ))
+
+
+class MockYouTube:
+    """
+    Threaded HTTP server of synthetic YouTube pages.
+
+    `requests` counts the requests served per page type ('watch', 'search', ...).
+    """
+
+    def __init__(self, port=0, latency=0.05, consent=True, ad_rate=0.5, ad_seconds=3, skip_after=1,
+                 results_per_page=20, max_pages=5, recommendations=20, recommendations_delay=0.3, time_scale=4):
+        """
+        Args:
+            port: Port to listen on (0: any free port)
+            latency: Seconds added before every response (network and server time)
+            consent: Show the GDPR consent dialog until it is accepted (cookie)
+            ad_rate: Fraction of watch pages starting with an ad
+            ad_seconds: Length of an ad
+            skip_after: Seconds before the ad's skip button appears
+            results_per_page: Renderers per batch of search results / homepage videos
+            max_pages: Batches before an infinite-scroll page runs out
+            recommendations: Up-next recommendations per watch page
+            recommendations_delay: Seconds before up next is rendered
+            time_scale: Speed of the player's clock relative to real time
+        """
+        self.latency = latency
+        self.consent = consent
+        self.ad_rate = ad_rate
+        self.ad_seconds = ad_seconds
+        self.skip_after = skip_after
+        self.results_per_page = results_per_page
+        self.max_pages = max_pages
+        self.recommendations = recommendations
+        self.recommendations_delay = recommendations_delay
+        self.time_scale = time_scale
+        self.requests = Counter()
+        self.__lock = threading.Lock()
+        self.__server = ThreadingHTTPServer(('127.0.0.1', port), self.__handler())
+        self.__server.daemon_threads = True
+        self.__thread = None
+
+    @property
+    def url(self):
+        host, port = self.__server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, page):
+        with self.__lock:
+            self.requests[page] += 1
+
+    # ----- catalog -----
+
+    def search_results(self, query, page):
+        seed = zlib.crc32(query.encode('utf-8'))
+        start = page * self.results_per_page
+        return [video_record(seed + i * 7) for i in range(start, start + self.results_per_page)]
+
+    def homepage_videos(self, page):
+        start = page * self.results_per_page
+        return [video_record(i * 11 + 3) for i in range(start, start + self.results_per_page)]
+
+    def channel_videos(self, handle, popular):
+        suffix = handle[len('@mockchannel'):]
+        k = int(suffix) % NUM_CHANNELS if handle.startswith('@mockchannel') and suffix.isdigit() else zlib.crc32(handle.encode('utf-8')) % NUM_CHANNELS
+        videos = [video_record(k + NUM_CHANNELS * i) for i in range(30)]
+        # Popular: most viewed first (a fixed shuffle); default tab: latest first
+        return sorted(videos, key=lambda v: zlib.crc32(v['videoId'].encode())) if popular else videos
+
+    def up_next(self, n):
+        return [video_record(n * 7 + i * 13 + 1) for i in range(self.recommendations)]
+
+    def has_ad(self, n):
+        return (zlib.crc32(video_id(n).encode()) % 1000) / 1000 < self.ad_rate
+
+    # ----- pages -----
+
+    def page(self, title, body, consent_needed, initial_data=None, player_response=None, scripts=()):
+        data = ''
+        if initial_data is not None:
+            data += f'<script>window.ytInitialData = {json.dumps(initial_data)};</script>'
+        if player_response is not None:
+            data += f'<script>window.ytInitialPlayerResponse = {json.dumps(player_response)};</script>'
+        scripts = ''.join(f'<script>{script}</script>' for script in scripts)
+        consent = CONSENT_HTML if consent_needed else ''
+        return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{html.escape(title)} - YouTube</title>'
+                f'<style>{STYLE}</style></head><body><ytd-app><div id="masthead"><a id="logo-icon" href="/">YouTube</a></div>'
+                f'{body}</ytd-app>{consent}{data}{scripts}</body></html>')
+
+    def infinite_list(self, renderers, more_url, wrapper):
+        return (f'<{wrapper}><div id="contents" data-more="{html.escape(more_url)}">{"".join(renderers)}'
+                f'<ytd-continuation-item-renderer></ytd-continuation-item-renderer></div></{wrapper}>')
+
+    def home_page(self, consent_needed):
+        videos = self.homepage_videos(0)
+        body = self.infinite_list([rich_item_renderer(v) for v in videos], '/mock/more?kind=home', 'ytd-browse')
+        return self.page('Home', body, consent_needed, scripts=[CONTINUATION_JS])
+
+    def search_page(self, query, consent_needed):
+        videos = self.search_results(query, 0)
+        body = self.infinite_list([search_renderer(v) for v in videos], f'/mock/more?kind=search&q={quote(query)}', 'ytd-search')
+        data = dict(contents=dict(twoColumnSearchResultsRenderer=dict(primaryContents=dict(sectionListRenderer=dict(contents=[
+            dict(itemSectionRenderer=dict(contents=[video_renderer_data(v) for v in videos]))
+        ])))))
+        return self.page(query, body, consent_needed, initial_data=data, scripts=[CONTINUATION_JS])
+
+    def channel_page(self, handle, consent_needed):
+        body = f'<ytd-browse><h1 id="channel-name">{html.escape(handle)}</h1><a href="/{handle}/videos">Videos</a></ytd-browse>'
+        return self.page(handle, body, consent_needed)
+
+    def channel_videos_page(self, handle, consent_needed):
+        latest = ''.join(rich_item_renderer(v) for v in self.channel_videos(handle, popular=False))
+        chips = ''.join(f'<div class="ytChipShapeChip" data-sort="{sort}">{label}</div>'
+                        for sort, label in [('latest', 'Latest'), ('popular', 'Popular'), ('oldest', 'Oldest')])
+        body = f'<ytd-browse><div id="chips">{chips}</div><div id="contents">{latest}</div></ytd-browse>'
+        # The chip empties the grid, then fills it with the server's sorted list
+        script = f"""
+document.querySelectorAll('.ytChipShapeChip').forEach(chip => chip.addEventListener('click', () => {{
+  document.getElementById('contents').innerHTML = '';
+  fetch('/mock/more?kind=channel&handle={quote(handle)}&sort=' + chip.dataset.sort).then(r => r.text()).then(fragment => {{
+    document.getElementById('contents').innerHTML = fragment;
+  }});
+}}));
+"""
+        return self.page(handle, body, consent_needed, scripts=[script])
+
+    def watch_page(self, vid, consent_needed):
+        n = video_number(vid)
+        video = video_record(n)
+        recommendations = self.up_next(n)
+        data = dict(
+            contents=dict(twoColumnWatchNextResults=dict(secondaryResults=dict(secondaryResults=dict(
+                results=[lockup_data(v) for v in recommendations])))),
+            currentVideoEndpoint=dict(watchEndpoint=dict(videoId=vid))
+        )
+        player_response = dict(videoDetails=dict(videoId=vid, title=video['title'], author=video['channel'],
+                                                 channelId=video['handle'], lengthSeconds=str(video['length'])))
+        config = dict(length=video['length'], adSeconds=self.ad_seconds if self.has_ad(n) else 0, skipAfter=self.skip_after,
+                      timeScale=self.time_scale, recommendationsDelay=self.recommendations_delay,
+                      recommendations=''.join(lockup_view_model(v) for v in recommendations))
+        body = (f'<ytd-watch-flexy><div id="movie_player" class="html5-video-player"><video></video>'
+                f'<button class="ytp-play-button" title="Play (k)"></button>'
+                f'<button class="ytp-skip-ad-button" style="display: none">Skip</button></div>'
+                f'<div id="container"><h1 class="title style-scope ytd-watch-metadata">{html.escape(video["title"])}</h1></div>'
+                f'<ytd-watch-next-secondary-results-renderer></ytd-watch-next-secondary-results-renderer></ytd-watch-flexy>')
+        return self.page(video['title'], body, consent_needed, initial_data=data, player_response=player_response,
+                         scripts=[f'window.mockPlayerConfig = {json.dumps(config)};', PLAYER_JS])
+
+    def more(self, params):
+        """HTML fragment of a continuation (kind=search/home) or of a channel sort. Returns (fragment, more)."""
+        kind = params.get('kind', [''])[0]
+        page = int(params.get('page', ['1'])[0])
+        if kind == 'channel':
+            videos = self.channel_videos(params.get('handle', [''])[0], popular=params.get('sort', [''])[0] == 'popular')
+            return ''.join(rich_item_renderer(v) for v in videos), False
+        if kind == 'search':
+            renderers = [search_renderer(v) for v in self.search_results(params.get('q', [''])[0], page)]
+        else:
+            renderers = [rich_item_renderer(v) for v in self.homepage_videos(page)]
+        return ''.join(renderers), page + 1 < self.max_pages
+
+    def __handler(self):
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def send(self, body, status=200, headers=None):
+                body = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+                path = url.path.rstrip('/') or '/'
+                consent_needed = fixture.consent and 'CONSENT=YES' not in (self.headers.get('Cookie') or '')
+                if fixture.latency:
+                    sleep(fixture.latency)
+                if path == '/':
+                    page, body = 'home', fixture.home_page(consent_needed)
+                elif path == '/results':
+                    page, body = 'search', fixture.search_page(params.get('search_query', [''])[0], consent_needed)
+                elif path == '/watch':
+                    page, body = 'watch', fixture.watch_page(params.get('v', [''])[0], consent_needed)
+                elif path == '/mock/more':
+                    fragment, more = fixture.more(params)
+                    fixture.count('continuation')
+                    return self.send(fragment, headers={'X-More': '1' if more else '0'})
+                elif path.startswith('/@') and path.endswith('/videos'):
+                    page, body = 'channel_videos', fixture.channel_videos_page(path[1:-len('/videos')], consent_needed)
+                elif path.startswith('/@'):
+                    page, body = 'channel', fixture.channel_page(path[1:], consent_needed)
+                else:
+                    fixture.count('not_found')
+                    return self.send('<html><body>Not found</body></html>', status=404)
+                fixture.count(page)
+                self.send(body)
+
+        return Handler
+
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    with MockYouTube(port=port) as fixture:
+        print(f"Mock YouTube at {fixture.url} (EYT_YOUTUBE_URL={fixture.url}), Ctrl-C to stop")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,101 @@
+"""
+Persistent SQLite cache of video metadata, keyed by video id
+
+Shared by EYTDriver (Video.get_metadata), sockpuppet.py, metadata_enrichment.py
+and analyze_results.py so each video's metadata is fetched once. Entries older
+than `ttl_days` are treated as missing (and refreshed by the next fetch); when
+the cache holds more than `max_entries` the least recently used are evicted.
+"""
+import json
+import os
+import sqlite3
+import threading
+from time import time
+
+from EYTDriver import VideoMetadata
+
+DEFAULT_PATH = os.path.join('output', 'metadata_cache.sqlite')
+
+
+class MetadataCache:
+    """SQLite-backed VideoMetadata cache with TTL refresh and LRU size bound."""
+
+    def __init__(self, path=DEFAULT_PATH, ttl_days=30, max_entries=500_000):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            ttl_days: Age after which an entry must be refetched
+            max_entries: Maximum number of cached videos
+        """
+        self.path = path
+        self.ttl = ttl_days * 24 * 3600
+        self.max_entries = max_entries
+        self.__lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Several threads (enrichment pool) share the connection under the lock;
+        # WAL lets several processes (puppets, analysis) read while one writes
+        self.__db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.__db.execute('PRAGMA journal_mode=WAL')
+        self.__db.execute(
+            'CREATE TABLE IF NOT EXISTS videos ('
+            ' id TEXT PRIMARY KEY, metadata TEXT NOT NULL,'
+            ' fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self.__db.execute('CREATE INDEX IF NOT EXISTS videos_accessed ON videos (accessed_at)')
+        self.__db.commit()
+
+    def get(self, video_id):
+        """Cached VideoMetadata, or None if missing or expired."""
+        return self.get_many([video_id]).get(video_id)
+
+    def get_many(self, video_ids):
+        """{video_id: VideoMetadata} for the fresh entries among video_ids."""
+        video_ids = list(dict.fromkeys(video_ids))
+        now = time()
+        found = {}
+        with self.__lock:
+            # Stay under SQLite's limit on query parameters
+            for i in range(0, len(video_ids), 500):
+                batch = video_ids[i:i + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self.__db.execute(
+                    f'SELECT id, metadata FROM videos WHERE id IN ({placeholders}) AND fetched_at >= ?',
+                    batch + [now - self.ttl]
+                ).fetchall()
+                for video_id, metadata in rows:
+                    found[video_id] = VideoMetadata(json.loads(metadata))
+                self.__db.executemany('UPDATE videos SET accessed_at = ? WHERE id = ?', [(now, video_id) for video_id, _ in rows])
+            self.__db.commit()
+        return found
+
+    def missing(self, video_ids):
+        """The video ids with no fresh cache entry (i.e. that need fetching)."""
+        cached = self.get_many(video_ids)
+        return [video_id for video_id in dict.fromkeys(video_ids) if video_id not in cached]
+
+    def put(self, metadata):
+        self.put_many([metadata])
+
+    def put_many(self, metadata_list):
+        """Insert or refresh entries, then evict the least recently used beyond max_entries."""
+        now = time()
+        rows = [(m.id, json.dumps(m.to_json(), default=str), now, now) for m in metadata_list if m.id]
+        with self.__lock:
+            self.__db.executemany('INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?)', rows)
+            excess = self.__db.execute('SELECT COUNT(*) FROM videos').fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.__db.execute(
+                    'DELETE FROM videos WHERE id IN (SELECT id FROM videos ORDER BY accessed_at LIMIT ?)', (excess,)
+                )
+            self.__db.commit()
+
+    def count(self):
+        """Number of cached videos, expired ones included."""
+        # Not __len__: an empty cache would be falsy and skipped by `if cache:` checks
+        with self.__lock:
+            return self.__db.execute('SELECT COUNT(*) FROM videos').fetchone()[0]
+
+    def close(self):
+        with self.__lock:
+            self.__db.close()
@@ -0,0 +1,166 @@
+"""
+Batch metadata enrichment of the videos collected by sockpuppets
+
+Collects every video id from the puppet outputs, deduplicates them across
+puppets and resolves their metadata with a bounded thread pool, retrying
+transient failures with exponential backoff. The extractor is any callable
+video_id -> info dict (yt-dlp by default), so a local stub can stand in for
+YouTube.
+
+Usage:
+    python metadata_enrichment.py [output/puppets] [output/metadata.jsonl] [--workers N]
+"""
+import json
+import os
+import random
+import threading
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import sleep, monotonic
+
+from EYTDriver import VideoMetadata, YoutubeDL
+from action_log import VIDEO_ACTIONS
+from metadata_cache import MetadataCache, DEFAULT_PATH as DEFAULT_CACHE_PATH
+
+# yt-dlp messages of errors that retrying cannot fix (matched against the lowercased
+# exception message); kept specific so that e.g. "503: Service Unavailable" is retried
+PERMANENT_ERRORS = [
+    'video unavailable', 'this video is not available', 'private video',
+    'this video has been removed', 'copyright claim',
+    'account associated with this video has been terminated', 'sign in to confirm your age',
+]
+
+
+class PermanentExtractionError(Exception):
+    """The video's metadata cannot be retrieved (private/deleted/blocked)."""
+    pass
+
+
+class YtDlpExtractor:
+    """Extractor backed by yt-dlp, with one YoutubeDL instance per thread (they are not thread-safe)."""
+
+    def __init__(self, options=None):
+        if YoutubeDL is None:
+            raise ImportError("yt_dlp is required for metadata extraction")
+        self.options = dict(quiet=True, no_warnings=True, skip_download=True, **(options or {}))
+        self.__local = threading.local()
+
+    def __call__(self, video_id):
+        if not hasattr(self.__local, 'ydl'):
+            self.__local.ydl = YoutubeDL(self.options)
+        return self.__local.ydl.extract_info(f'https://www.youtube.com/watch?v={video_id}', download=False)
+
+
+def collect_video_ids(puppets_dir):
+    """Unique video ids (first-seen order) across all puppet outputs."""
+    video_ids = {}
+    for filename in sorted(os.listdir(puppets_dir)):
+        filepath = os.path.join(puppets_dir, filename)
+        if not os.path.isfile(filepath):
+            continue
+        try:
+            with open(filepath) as f:
+                data = json.load(f)
+        except ValueError as e:
+            print(f"Skipping {filename}: {e}")
+            continue
+        for action in data.get('actions', []):
+            # Other actions log dicts or profile paths, not video ids
+            if action.get('action') not in VIDEO_ACTIONS:
+                continue
+            params = action.get('params')
+            if isinstance(params, str):
+                params = [params]
+            if isinstance(params, list):
+                for video_id in params:
+                    if isinstance(video_id, str) and video_id:
+                        video_ids.setdefault(video_id, None)
+    return list(video_ids)
+
+
+def extract_with_retry(extractor, video_id, retries=3, backoff=1.0):
+    """Call the extractor, retrying transient errors after backoff * 2^attempt seconds (with jitter)."""
+    for attempt in range(retries + 1):
+        try:
+            return extractor(video_id)
+        except Exception as e:
+            message = str(e).lower()
+            if any(error in message for error in PERMANENT_ERRORS):
+                raise PermanentExtractionError(str(e)) from e
+            if attempt == retries:
+                raise
+            sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+
+
+def enrich(video_ids, extractor=None, workers=8, retries=3, backoff=1.0, cache=None, verbose=False):
+    """
+    Resolve metadata for the given videos (duplicates are fetched once).
+
+    With a MetadataCache, fresh cached entries are not fetched again and every
+    fetched video is stored as soon as it resolves.
+
+    Returns (metadata, failures): {video_id: VideoMetadata} and {video_id: error message}.
+    """
+    video_ids = list(dict.fromkeys(video_ids))
+    metadata = cache.get_many(video_ids) if cache is not None else {}
+    to_fetch = [video_id for video_id in video_ids if video_id not in metadata]
+    failures = {}
+    start = monotonic()
+    if verbose and cache is not None:
+        print(f"{len(metadata)} videos cached, {len(to_fetch)} to fetch")
+    if not to_fetch:
+        return metadata, failures
+    extractor = extractor or YtDlpExtractor()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(extract_with_retry, extractor, video_id, retries, backoff): video_id for video_id in to_fetch}
+        for done, future in enumerate(as_completed(futures), start=1):
+            video_id = futures[future]
+            try:
+                metadata[video_id] = VideoMetadata(future.result())
+                if cache is not None:
+                    cache.put(metadata[video_id])
+            except Exception as e:
+                failures[video_id] = f"{type(e).__name__}: {e}"
+            if verbose and done % 50 == 0:
+                print(f"{done}/{len(to_fetch)} videos processed ({len(failures)} failures)")
+
+    if verbose:
+        print(f"Fetched {len(to_fetch) - len(failures)} videos, {len(failures)} failures in {monotonic() - start:.1f}s")
+    return metadata, failures
+
+
+def metadata_record(video_metadata):
+    """JSON-serializable fields of a VideoMetadata (without the raw yt-dlp dict)."""
+    return video_metadata.as_dict()
+
+
+def main():
+    parser = ArgumentParser(description='Fetch metadata for every video collected by the sockpuppets')
+    parser.add_argument('puppets_dir', nargs='?', default=os.path.join('output', 'puppets'))
+    parser.add_argument('output', nargs='?', default=os.path.join('output', 'metadata.jsonl'))
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent extractions')
+    parser.add_argument('--retries', type=int, default=3, help='Retries per video for transient errors')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='Metadata cache database')
+    parser.add_argument('--no-cache', action='store_true', help='Fetch every video, ignoring the cache')
+    args = parser.parse_args()
+
+    video_ids = collect_video_ids(args.puppets_dir)
+    print(f"{len(video_ids)} unique videos in {args.puppets_dir}")
+    cache = None if args.no_cache else MetadataCache(args.cache)
+    metadata, failures = enrich(video_ids, workers=args.workers, retries=args.retries, cache=cache, verbose=True)
+    if cache is not None:
+        cache.close()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        for video_id in video_ids:
+            if video_id in metadata:
+                record = dict(metadata_record(metadata[video_id]), status='ok')
+            else:
+                record = dict(id=video_id, status='error', error=failures.get(video_id))
+            f.write(json.dumps(record, default=str) + '\n')
+    print(f"Metadata written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
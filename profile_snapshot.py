@@ -0,0 +1,63 @@
+"""
+Snapshots of trained Chrome profiles, so one trained puppet can fan out to many searches
+
+A snapshot is a copy of a closed browser's user-data-dir. Search puppets start
+from a clone of it, made with reflinks (copy-on-write) where the filesystem
+supports them and a regular copy otherwise.
+"""
+import os
+import shutil
+import subprocess
+
+# Written last: a snapshot without it is incomplete (e.g. the container died while copying)
+COMPLETE_MARKER = '.snapshot_complete'
+
+# Per-process lock files Chrome leaves in a profile; a copy must not carry them
+LOCK_FILES = ['SingletonLock', 'SingletonSocket', 'SingletonCookie', 'lockfile', 'DevToolsActivePort']
+
+
+def _copy_tree(src, dst):
+    """Copy src to dst, sharing blocks copy-on-write when possible."""
+    if os.name != 'nt':
+        result = subprocess.run(['cp', '-a', '--reflink=auto', src, dst], capture_output=True)
+        if result.returncode == 0:
+            return
+        shutil.rmtree(dst, ignore_errors=True)
+    shutil.copytree(src, dst, symlinks=True, ignore=shutil.ignore_patterns(*LOCK_FILES))
+
+
+def remove_lock_files(profile_dir):
+    """Remove locks left by a browser that was killed (they would make Chrome refuse the profile)."""
+    # Singleton* entries are (possibly dangling) symlinks; os.walk lists them as files
+    for root, _, files in os.walk(profile_dir):
+        for name in files:
+            if name in LOCK_FILES:
+                os.remove(os.path.join(root, name))
+
+
+def is_complete(snapshot_dir):
+    return os.path.exists(os.path.join(snapshot_dir, COMPLETE_MARKER))
+
+
+def snapshot_profile(profile_dir, snapshot_dir):
+    """Copy a closed browser profile to snapshot_dir (replacing any previous, incomplete one)."""
+    if os.path.exists(snapshot_dir):
+        shutil.rmtree(snapshot_dir)
+    os.makedirs(os.path.dirname(snapshot_dir) or '.', exist_ok=True)
+    _copy_tree(profile_dir, snapshot_dir)
+    remove_lock_files(snapshot_dir)
+    with open(os.path.join(snapshot_dir, COMPLETE_MARKER), 'w') as f:
+        f.write(profile_dir)
+    return snapshot_dir
+
+
+def clone_profile(snapshot_dir, profile_dir):
+    """Create a fresh, writable profile from a snapshot."""
+    if not is_complete(snapshot_dir):
+        raise ValueError(f"Incomplete or missing profile snapshot: {snapshot_dir}")
+    if os.path.exists(profile_dir):
+        shutil.rmtree(profile_dir)
+    os.makedirs(os.path.dirname(profile_dir) or '.', exist_ok=True)
+    _copy_tree(snapshot_dir, profile_dir)
+    os.remove(os.path.join(profile_dir, COMPLETE_MARKER))
+    return profile_dir
@@ -0,0 +1,124 @@
+"""
+Columnar store of sockpuppet results (partitioned Parquet dataset)
+
+Puppet JSON files from output/puppets are flattened to one row per collected
+video: puppet_id, ideology, query, action, rank, video_id, timestamp. Rows are
+written under output/results/ideology=<...>/action=<...>/ and a manifest keeps
+track of the puppet files already ingested, so each ingest only reads new ones.
+
+Requires pandas and pyarrow.
+
+Usage:
+    python results_store.py [output/puppets] [output/results]
+"""
+import json
+import os
+import sys
+from uuid import uuid4
+
+import pandas as pd
+
+from action_log import VIDEO_ACTIONS
+
+PUPPETS_DIR = os.path.join('output', 'puppets')
+STORE_DIR = os.path.join('output', 'results')
+MANIFEST = '_ingested.json'
+
+COLUMNS = ['puppet_id', 'ideology', 'query', 'action', 'rank', 'video_id', 'timestamp']
+PARTITIONS = ['ideology', 'action']
+
+
+def puppet_rows(data):
+    """Flatten one puppet JSON into rows; only VIDEO_ACTIONS are kept."""
+    args = data.get('args') or {}
+    puppet_id = data.get('puppet_id', '')
+    ideology = args.get('ideologyFilter') or puppet_id.split(',')[0]
+    query = args.get('searchQuery', '')
+    rows = []
+    for action in data.get('actions', []):
+        if action.get('action') not in VIDEO_ACTIONS:
+            continue
+        params = action.get('params')
+        timestamp = action.get('time') or data.get('start_time')
+        if isinstance(params, str):
+            # e.g. 'watch' records a single video id
+            videos = [params]
+        elif isinstance(params, list) and all(isinstance(p, str) for p in params):
+            videos = params
+        else:
+            continue
+        for rank, video_id in enumerate(videos, start=1):
+            # Multi-query puppets tag their search actions with the query
+            rows.append(dict(puppet_id=puppet_id, ideology=ideology, query=action.get('query', query), action=action['action'],
+                             rank=rank, video_id=video_id, timestamp=timestamp))
+    return rows
+
+
+def load_manifest(store_dir):
+    path = os.path.join(store_dir, MANIFEST)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(store_dir, manifest):
+    path = os.path.join(store_dir, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def ingest(puppets_dir=PUPPETS_DIR, store_dir=STORE_DIR):
+    """Append the rows of puppet files not yet in the store. Returns the number of new files."""
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = load_manifest(store_dir)
+
+    rows = []
+    new_files = []
+    for filename in sorted(os.listdir(puppets_dir)):
+        filepath = os.path.join(puppets_dir, filename)
+        if filename in manifest or not os.path.isfile(filepath):
+            continue
+        try:
+            with open(filepath, 'r') as f:
+                rows.extend(puppet_rows(json.load(f)))
+        except ValueError as e:
+            # Still being written (or corrupt): retried on the next ingest
+            print(f"Skipping {filename}: {e}")
+            continue
+        new_files.append(filename)
+
+    if rows:
+        df = pd.DataFrame(rows, columns=COLUMNS)
+        df['timestamp'] = pd.to_datetime(df['timestamp'], errors='coerce', format='mixed')
+        # One new file per partition per ingest; existing files are never rewritten
+        df.to_parquet(store_dir, engine='pyarrow', partition_cols=PARTITIONS, index=False,
+                      basename_template=f'part-{uuid4().hex[:12]}-{{i}}.parquet')
+
+    # Manifest is written after the data, so a crash re-ingests rather than loses files
+    for filename in new_files:
+        manifest[filename] = os.path.getmtime(os.path.join(puppets_dir, filename))
+    save_manifest(store_dir, manifest)
+    return len(new_files)
+
+
+def load_results(store_dir=STORE_DIR, filters=None):
+    """
+    Read the store as a DataFrame with COLUMNS.
+
+    `filters` is passed to pyarrow, e.g. [('action', '==', 'search_results')].
+    """
+    if not os.path.exists(store_dir) or len(os.listdir(store_dir)) <= 1:
+        return pd.DataFrame(columns=COLUMNS)
+    df = pd.read_parquet(store_dir, engine='pyarrow', filters=filters)
+    # Partition columns come back as categoricals
+    for column in PARTITIONS:
+        df[column] = df[column].astype(str)
+    return df[COLUMNS].sort_values(['puppet_id', 'timestamp', 'action', 'rank'], kind='stable').reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    puppets_dir = sys.argv[1] if len(sys.argv) > 1 else PUPPETS_DIR
+    store_dir = sys.argv[2] if len(sys.argv) > 2 else STORE_DIR
+    print(f"Ingested {ingest(puppets_dir, store_dir)} new puppet files into {store_dir}")
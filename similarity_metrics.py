@@ -0,0 +1,144 @@
+"""
+Vectorized pairwise similarity of ranked video lists (search results, recommendations)
+
+Video ids are encoded to integers and every metric is computed for all pairs of
+lists at once with NumPy:
+- Jaccard index of the sets
+- rank-biased overlap (RBO, extrapolated form of Webber et al. 2010)
+- Kendall tau over the videos both lists contain (NaN with fewer than 2 in common)
+
+Lists are compared on their top `depth` entries. Duplicate ids within a list
+keep their first (best) rank.
+"""
+import numpy as np
+import pandas as pd
+
+# Upper bound on the size of the (chunk, n, depth) intermediate arrays
+CHUNK_ELEMENTS = 2_000_000
+
+
+def encode_lists(lists, depth=None):
+    """
+    Encode ranked lists of video ids as an (n, depth) int array padded with -1.
+
+    Returns (codes, vocabulary) where vocabulary[code] is the video id.
+    """
+    lists = [list(dict.fromkeys(videos)) for videos in lists]
+    if depth is None:
+        depth = max((len(videos) for videos in lists), default=0)
+    lists = [videos[:depth] for videos in lists]
+    flat = [video for videos in lists for video in videos]
+    flat_codes, vocabulary = pd.factorize(pd.Series(flat, dtype=object))
+
+    codes = np.full((len(lists), depth), -1, dtype=np.int64)
+    lengths = np.array([len(videos) for videos in lists], dtype=np.int64)
+    rows = np.repeat(np.arange(len(lists)), lengths)
+    cols = np.concatenate([np.arange(n) for n in lengths]) if len(flat) else np.array([], dtype=np.int64)
+    codes[rows, cols] = flat_codes
+    return codes, np.asarray(vocabulary)
+
+
+def _shared_rank_matrix(codes):
+    """
+    Rank (1-based) of every video in every list, restricted to videos present in
+    at least two lists (others never contribute to a pairwise overlap).
+
+    Returns (ranks, shared_index): ranks is (n, n_shared + 1) with 0 for absent and
+    a last all-zero column; shared_index maps codes to a column (n_shared if not shared).
+    """
+    n, depth = codes.shape
+    valid = codes >= 0
+    vocabulary_size = codes.max() + 1 if valid.any() else 0
+    counts = np.bincount(codes[valid], minlength=vocabulary_size)
+    shared = np.flatnonzero(counts >= 2)
+
+    lookup = np.full(vocabulary_size + 1, len(shared), dtype=np.int64)
+    lookup[shared] = np.arange(len(shared))
+    # code -1 (padding) maps to the last entry, i.e. "not shared"
+    shared_index = lookup[codes]
+
+    dtype = np.int16 if depth < np.iinfo(np.int16).max else np.int32
+    ranks = np.zeros((n, len(shared) + 1), dtype=dtype)
+    rows, cols = np.nonzero(valid & (shared_index < len(shared)))
+    ranks[rows, shared_index[rows, cols]] = cols + 1
+    return ranks, shared_index
+
+
+def pairwise_metrics(lists, depth=None, p=0.9):
+    """
+    All-pairs Jaccard, RBO and Kendall tau between ranked lists.
+
+    Args:
+        lists: sequence of lists of video ids, best first
+        depth: compare the top `depth` entries (default: longest list)
+        p: RBO persistence (weight of deeper ranks)
+
+    Returns a dict of (n, n) float arrays: 'jaccard', 'rbo', 'kendall_tau'.
+    """
+    codes, _ = encode_lists(lists, depth)
+    n, depth = codes.shape
+    lengths = (codes >= 0).sum(axis=1)
+    ranks, shared_index = _shared_rank_matrix(codes)
+
+    # RBO: with m = max(rank in i, rank in j) of a common video, it is counted in
+    # the overlap X_k for every k >= m, so sum_k p^k X_k / k = sum_v W[m_v]
+    k = np.arange(1, depth + 1)
+    W = np.zeros(depth + 2)
+    W[1:depth + 1] = np.cumsum((p ** k / k)[::-1])[::-1]
+
+    jaccard = np.empty((n, n))
+    rbo = np.empty((n, n))
+    kendall_tau = np.full((n, n), np.nan)
+    upper = np.triu(np.ones((depth, depth), dtype=bool), k=1)
+
+    chunk = max(1, CHUNK_ELEMENTS // max(1, n * depth))
+    for start in range(0, n, chunk):
+        rows = slice(start, min(n, start + chunk))
+        # Y[c, j, a]: rank in list j of the video at position a of list `start + c` (0 if absent)
+        Y = ranks[:, shared_index[rows]].transpose(1, 0, 2)
+        present = Y > 0
+        overlap = present.sum(axis=2)
+
+        union = lengths[rows, None] + lengths[None, :] - overlap
+        jaccard[rows] = np.where(union > 0, overlap / np.maximum(union, 1), 1.0)
+
+        m = np.where(present, np.maximum(Y, k[None, None, :]), depth + 1)
+        rbo[rows] = (overlap / max(depth, 1)) * p ** depth + (1 - p) / p * W[m].sum(axis=2)
+
+        # Kendall tau only for the (usually few) pairs with 2+ common videos. Positions
+        # in list i are increasing, so a pair (a < b) of common videos is concordant
+        # iff it is also increasing in list j
+        c, j = np.nonzero(overlap >= 2)
+        if len(c):
+            Ys = Y[c, j].astype(np.int32)
+            both = present[c, j][:, :, None] & present[c, j][:, None, :] & upper
+            concordance = (np.sign(Ys[:, None, :] - Ys[:, :, None]) * both).sum(axis=(1, 2))
+            pairs = overlap[c, j] * (overlap[c, j] - 1) / 2
+            kendall_tau[c + start, j] = concordance / pairs
+
+    # A list compared with itself: its own videos were skipped if no other list has them
+    diagonal = np.arange(n)
+    jaccard[diagonal, diagonal] = 1.0
+    self_overlap = np.cumsum(W[1:depth + 1])
+    rbo[diagonal, diagonal] = (lengths / max(depth, 1)) * p ** depth + (1 - p) / p * np.concatenate([[0.0], self_overlap])[lengths]
+    kendall_tau[diagonal, diagonal] = np.where(lengths >= 2, 1.0, np.nan)
+
+    return dict(jaccard=jaccard, rbo=rbo, kendall_tau=kendall_tau)
+
+
+def group_means(matrix, groups):
+    """
+    Mean of a pairwise matrix between and within groups (e.g. ideologies), ignoring
+    the diagonal (a list compared with itself) and NaN entries.
+
+    Returns (labels, (g, g) array).
+    """
+    labels, index = np.unique(np.asarray(groups), return_inverse=True)
+    onehot = np.eye(len(labels))[index]
+    valid = ~np.isnan(matrix)
+    np.fill_diagonal(valid, False)
+    values = np.where(valid, matrix, 0.0)
+    sums = onehot.T @ values @ onehot
+    counts = onehot.T @ valid.astype(float) @ onehot
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return labels, np.where(counts > 0, sums / counts, np.nan)
@@ -1,29 +1,93 @@
-from EYTDriver import EYTDriver, Video, VideoUnavailableException
+from EYTDriver import EYTDriver, Video, VideoUnavailableException, DEFAULT_BLOCKED_URLS, YOUTUBE_URL
+from profile_snapshot import snapshot_profile, clone_profile, remove_lock_files, is_complete
+from action_log import ActionLog, read_records, action_from_record, recommendation_graph
+from metadata_cache import MetadataCache
 import sys
 import json
 from datetime import datetime
 import os
 from random import choice
 import csv
+import shutil
+from collections import deque
+import multiprocessing
+from argparse import ArgumentParser
 
 puppet = None
 
-def parse_args():
-    with open(sys.argv[1]) as f:
+# Approximate resident memory of one puppet (Chrome browser + renderers, chromedriver, Python)
+DEFAULT_PUPPET_MEMORY_MB = 1024
+# Browsers pooled by each worker process: the next one warms up while the current puppet runs
+WORKER_POOL_SIZE = 2
+# Approximate resident memory of a warm, idle pooled browser (about:blank, one renderer)
+SPARE_BROWSER_MEMORY_MB = 300
+
+def parse_args(path=None):
+    with open(path or sys.argv[1]) as f:
         return json.load(f)
 
-def init_puppet(puppetId, profile_dir):
-    global puppet
+def use_virtual_display():
+    # Puppets running as workers share the display started by the parent process
+    if os.environ.get('EYT_SHARED_DISPLAY'):
+        return False
     # Disable virtual display on Windows
-    use_virtual_display = os.name != 'nt'  # False on Windows, True on Linux
-    
+    return os.name != 'nt'  # False on Windows, True on Linux
+
+def use_headless():
     # Force headless mode in Docker environment
-    headless_mode = os.path.exists('/.dockerenv') or os.name != 'nt'
+    return os.path.exists('/.dockerenv') or os.name != 'nt'
+
+def needs_persistent_profile(puppet_args=None):
+    """Snapshotting, starting from a snapshot, resuming and resetting between queries need the browser to run on profile_dir."""
+    puppet_args = puppet_args or args
+    return (bool(puppet_args.get('baseSnapshot') or puppet_args.get('checkpoint') or puppet_args.get('searchReset'))
+            or 'snapshot' in puppet_args['steps'].split(','))
+
+def launch_driver(profile_dir, virtual_display=None):
+    """Start a browser on the persistent profile_dir."""
+    if virtual_display is None:
+        virtual_display = use_virtual_display()
+    if os.path.exists(profile_dir):
+        # Left behind if a previous run of this puppet was killed
+        remove_lock_files(profile_dir)
+    return EYTDriver(browser='chrome', verbose=True, profile_dir=profile_dir, unique_profile=False,
+                     use_virtual_display=virtual_display, headless=use_headless())
+
+def configure_driver(driver):
+    """
+    Apply the puppet's page load policy (block resources the audit does not need
+    unless fullPageLoad) and result extraction mode ('dom' or 'json').
+    """
+    driver.extraction = args.get('extraction', 'dom')
+    if args.get('fullPageLoad'):
+        driver.block_resources([])
+    else:
+        driver.block_resources(args.get('blockedUrls', DEFAULT_BLOCKED_URLS))
+
+def init_puppet(puppetId, profile_dir, driver=None):
+    """Create the puppet state; `driver` is a pre-launched EYTDriver (e.g. leased from a BrowserPool)."""
+    global puppet
+    owns_driver = driver is None
+    if needs_persistent_profile():
+        if driver is not None:
+            print("Puppet needs its own profile directory, not using the pre-launched browser")
+        if args.get('baseSnapshot') and not os.path.exists(profile_dir):
+            print(f"Starting from trained profile snapshot {args['baseSnapshot']}")
+            clone_profile(args['baseSnapshot'], profile_dir)
+        driver = launch_driver(profile_dir)
+        owns_driver = True
+    elif driver is None:
+        # driver = EYTDriver(verbose=True, profile_dir=profile_dir),#, use_virtual_display=True),
+        driver = EYTDriver(browser='chrome', verbose=True, use_virtual_display=use_virtual_display(), headless=use_headless())
+    # Pooled browsers may have been launched with other settings
+    configure_driver(driver)
     
     puppet = dict(
-        # driver=EYTDriver(verbose=True, profile_dir=profile_dir),#, use_virtual_display=True),
-        driver=EYTDriver(browser='chrome', verbose=True, use_virtual_display=use_virtual_display, headless=headless_mode),
+        driver=driver,
+        # False when the driver belongs to a BrowserPool, which closes it on release
+        owns_driver=owns_driver,
         puppetId=puppetId,
+        profile_dir=profile_dir,
         actions=[],
         start_time=datetime.now()
     )
@@ -36,11 +100,59 @@ def makedir(outputDir, d):
     return dir
 
 def make_url(videoId):
-    return 'https://youtube.com/watch?v=%s' % videoId
+    return '%s/watch?v=%s' % (YOUTUBE_URL, videoId)
+
+# ========================================
+# CHECKPOINTS
+# ========================================
+# With args['checkpoint'] set, progress is saved next to the persistent profile
+# after every completed unit (step, channel video, training video). Re-running
+# the same argument file resumes from there with the same profile.
 
-def add_action(action, params=None):
-    print(action, params)
-    puppet['actions'].append(dict(action=action, params=params))
+def checkpoint_path():
+    return os.path.join(makedir(args['outputDir'], 'profiles'), f"{args['puppetId']}.checkpoint.json")
+
+def load_checkpoint():
+    """Checkpoint of an interrupted run of this puppet, or None."""
+    if not args.get('checkpoint') or not os.path.exists(checkpoint_path()):
+        return None
+    try:
+        with open(checkpoint_path()) as f:
+            return json.load(f)
+    except ValueError:
+        print("Unreadable checkpoint, starting from scratch")
+        return None
+
+def save_checkpoint(**fields):
+    """Update the checkpoint (step_index, progress of the current step) and write it atomically."""
+    if not args.get('checkpoint'):
+        return
+    # The actions the checkpoint counts as done must be on disk before it is
+    puppet['log'].flush()
+    puppet['checkpoint'].update(fields)
+    path = checkpoint_path()
+    with open(path + '.tmp', 'w') as f:
+        json.dump(puppet['checkpoint'], f, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+def step_progress():
+    """Saved progress of the step being (re)started; empty on a fresh run."""
+    return puppet['checkpoint']['progress']
+
+def restore_from_checkpoint(checkpoint):
+    """Continue an interrupted run: keep its start time and the actions already logged."""
+    puppet['checkpoint'] = checkpoint
+    puppet['start_time'] = checkpoint['start_time']
+    puppet['actions'] = [action_from_record(r) for r in read_records(puppet['log'].path) if r['type'] == 'action']
+    add_action('resume', dict(step_index=checkpoint['step_index'], progress=checkpoint['progress']))
+
+def add_action(action, params=None, **details):
+    """Record an action; `details` are extra fields (e.g. ad time of a watch)."""
+    print(action, params, details or '')
+    record = puppet['log'].write('action', action=action, params=params, **details)
+    puppet['actions'].append(dict(action=action, params=params, time=record['time'], **details))
 
 def get_homepage():
     homepage = puppet['driver'].get_homepage_recommendations()
@@ -52,10 +164,15 @@ def get_recommendations():
     add_action('get_recommendations', [vid.videoId for vid in recommendations])
     return recommendations
 
-def watch(video: Video, duration):
+def watch(video: Video, duration, training=False):
+    """Watch a video; training watches use the puppet's playback rate and seek position."""
     driver = puppet['driver']
-    driver.play(video, duration=duration)
-    add_action('watch', video.videoId)
+    if training:
+        stats = driver.play(video, duration=duration, playback_rate=args.get('playbackRate', 1.0), seek_to=args.get('seekTo'))
+        add_action('watch', video.videoId, training=True, **stats)
+    else:
+        stats = driver.play(video, duration=duration)
+        add_action('watch', video.videoId, **stats)
 
 def load_channels_from_csv(csv_file, ideology_filter=None):
     """Load channels from CSV file and return list of channel handles, optionally filtered by ideology."""
@@ -97,7 +214,11 @@ def load_channels_from_csv(csv_file, ideology_filter=None):
 
 def train_from_channels(channels_file, max_channels=None, videos_per_channel=3, ideology_filter=None):
     """Train puppet by watching popular videos from channels."""
-    add_action("channel_training_start")
+    # Resume point: channels before channel_index are done, channel_watched lists
+    # the videos already watched from the channel at channel_index
+    progress = step_progress()
+    if not progress:
+        add_action("channel_training_start")
     
     # Load channels with ideology filter
     channels = load_channels_from_csv(channels_file, ideology_filter)
@@ -111,37 +232,58 @@ def train_from_channels(channels_file, max_channels=None, videos_per_channel=3,
     
     # Get number of videos to actually watch
     trainingN = int(args.get('trainingN', len(channels) * videos_per_channel))
-    watched = 0
+
+    watched = progress.get('watched', 0)
+    start_index = progress.get('channel_index', 0)
+
+    # The next channel's videos page loads in a background tab while this channel's videos play
+    prefetch = args.get('prefetchChannels', True)
+    prefetched = None  # (channel_index, tab)
     
-    for channel in channels:
+    for channel_index, channel in enumerate(channels):
+        if channel_index < start_index:
+            continue
         if watched >= trainingN:
             break
-            
+
+        already_watched = progress.get('channel_watched', []) if channel_index == start_index else []
         try:
             print(f"Training from channel: {channel['name']} ({channel['handle']})")
             driver = puppet['driver']
             
-            # Navigate to channel
-            driver.go_to_channel_from_handle(channel['handle'])
-            
-            # Get popular videos from channel
-            popular_videos = driver.watch_top_video()
+            popular_videos = None
+            if prefetched and prefetched[0] == channel_index:
+                # None if the tab was lost: loaded the usual way below
+                popular_videos = driver.top_videos_from_tab(prefetched[1])
+                prefetched = None
+            if popular_videos is None:
+                # Navigate to channel
+                driver.go_to_channel_from_handle(channel['handle'])
+                
+                # Get popular videos from channel
+                popular_videos = driver.watch_top_video()
+
+            if prefetch and channel_index + 1 < len(channels) and watched < trainingN:
+                prefetched = (channel_index + 1, driver.prefetch_channel_videos(channels[channel_index + 1]['handle']))
             
             if not popular_videos:
                 print(f"No popular videos found for channel {channel['name']}")
-                continue
+                popular_videos = []
             
             # Watch up to videos_per_channel videos from this channel
-            channel_watched = 0
+            channel_watched = list(already_watched)
             for video in popular_videos[:videos_per_channel]:
-                if watched >= trainingN or channel_watched >= videos_per_channel:
+                if watched >= trainingN or len(channel_watched) >= videos_per_channel:
                     break
+                if video.videoId in channel_watched:
+                    continue
                     
                 try:
                     print(f"  Watching video {video.videoId}")
-                    watch(video, args['duration'])
+                    watch(video, args['duration'], training=True)
                     watched += 1
-                    channel_watched += 1
+                    channel_watched.append(video.videoId)
+                    save_checkpoint(progress=dict(channel_index=channel_index, channel_watched=channel_watched, watched=watched))
                 except VideoUnavailableException:
                     print(f"  Video {video.videoId} unavailable, skipping...")
                     continue
@@ -151,12 +293,37 @@ def train_from_channels(channels_file, max_channels=None, videos_per_channel=3,
                     
         except Exception as e:
             print(f"Error processing channel {channel['name']}: {e}")
-            continue
+        # Not in a finally: a channel interrupted by Ctrl-C or a crash is resumed, not skipped
+        save_checkpoint(progress=dict(channel_index=channel_index + 1, channel_watched=[], watched=watched))
+
+    if prefetched:
+        puppet['driver'].close_tab(prefetched[1])
     
     add_action("channel_training_end", {"channels_processed": len(channels), "videos_watched": watched})
     print(f"Channel training completed: {watched} videos watched from {len(channels)} channels")
 
+def watch_mode():
+    """Training watch settings and the effective speed measured over the training watches."""
+    # Other watches run at normal speed and would dilute the measured rate
+    watches = [a for a in puppet['actions'] if a['action'] == 'watch' and a.get('training') and a.get('effective_rate')]
+    return dict(
+        playback_rate=args.get('playbackRate', 1.0),
+        seek_to=args.get('seekTo'),
+        watched_seconds=round(sum(a.get('watched_seconds', 0) for a in watches), 1),
+        wall_seconds=round(sum(a.get('watch_wall_seconds', 0) for a in watches), 1),
+        mean_effective_rate=round(sum(a['effective_rate'] for a in watches) / len(watches), 2) if watches else None
+    )
+
 def save_puppet():
+    step_timings = puppet['driver'].step_timings
+    page_loads = puppet['driver'].page_loads
+    browser = dict(
+        startup_seconds=puppet['driver'].startup_seconds,
+        lease_wait_seconds=getattr(puppet['driver'], 'lease_wait', None),
+        blocked_urls=puppet['driver'].blocked_urls
+    )
+    mode = watch_mode()
+    puppet['log'].write('end', flush=True, step_timings=step_timings, page_loads=page_loads, browser=browser, watch_mode=mode)
     js = dict(
             puppet_id=puppet['puppetId'],
             start_time=puppet['start_time'],
@@ -164,14 +331,22 @@ def save_puppet():
             duration=puppet['duration'],
             description=puppet['description'],
             actions=puppet['actions'],
+            step_timings=step_timings,
+            page_loads=page_loads,
+            browser=browser,
+            watch_mode=mode,
+            recommendation_graph=recommendation_graph(puppet['actions']),
             args=args
         )
     with open(os.path.join(makedir(args['outputDir'], 'puppets'), puppet['puppetId']), 'w') as f:
         json.dump(js, f, default=str, indent=4)
 
 def train():
+    # number of videos watched (and next video to try, when resuming)
+    progress = step_progress()
     get_homepage()
-    add_action("training_start")
+    if not progress:
+        add_action("training_start")
 
     # get list of videoIds
     training_videos = args['training']
@@ -182,22 +357,25 @@ def train():
     # get number of videos to actually watch
     trainingN = int(args['trainingN'])
 
-    # number of videos watched
-    watched = 0
+    watched = progress.get('watched', 0)
     
-    for videoId in training_videos:
+    for video_index, videoId in enumerate(training_videos):
+        if video_index < progress.get('video_index', 0):
+            continue
         # watch until N videos have been watched
         if watched >= trainingN:
             break
         # watch next video if available
         try:
             video = Video(None, make_url(videoId))
-            watch(video, args['duration'])
+            watch(video, args['duration'], training=True)
             watched += 1
         except VideoUnavailableException:
-            continue
+            pass
         except Exception as e:
             print(e)
+        # Not in a finally: a video interrupted by Ctrl-C or a crash is watched again on resume
+        save_checkpoint(progress=dict(video_index=video_index + 1, watched=watched))
     add_action("training_end")
 
 def test():
@@ -210,11 +388,60 @@ def test():
         video = r[0]
     add_action("testing_end")
 
+def search_queries():
+    """Queries of the search step: searchQueries, else searchQueriesFile (one per line), else searchQuery."""
+    if args.get('searchQueries'):
+        return list(args['searchQueries'])
+    if args.get('searchQueriesFile'):
+        with open(args['searchQueriesFile'], encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+    return [args.get('searchQuery', 'gilet jaune')]
+
+def pre_search_snapshot():
+    return os.path.join(makedir(args['outputDir'], 'snapshots'), f"{args['puppetId']}.pre_search")
+
+def reset_profile(snapshot_dir):
+    """Restart the browser on a copy of the profile as it was before the first query."""
+    puppet['driver'].quit()
+    clone_profile(snapshot_dir, puppet['profile_dir'])
+    relaunch_driver()
+
 def search():
-    """Search for a query and collect recommendations from search results."""
-    add_action("search_start")
-    
-    search_query = args.get('searchQuery', 'gilet jaune')
+    """
+    Search for each query and collect recommendations from its results. With
+    searchReset, every query starts from the profile as it was before the first
+    one, so earlier searches do not contaminate later ones.
+    """
+    queries = search_queries()
+    reset = bool(args.get('searchReset')) and len(queries) > 1
+    progress = step_progress()
+    if not progress:
+        add_action("search_start", dict(queries=queries, reset=reset))
+
+    for query_index, query in enumerate(queries):
+        if query_index < progress.get('query_index', 0):
+            continue
+        if reset and is_complete(pre_search_snapshot()):
+            # Also undoes a query interrupted before a resume
+            print("Resetting profile before next query")
+            reset_profile(pre_search_snapshot())
+        elif reset:
+            # Chrome must be closed for its profile files to be consistent
+            puppet['driver'].quit()
+            snapshot_profile(puppet['profile_dir'], pre_search_snapshot())
+            relaunch_driver()
+        try:
+            search_query(query)
+        except Exception as e:
+            print(f"Error searching for '{query}': {e}")
+        save_checkpoint(progress=dict(query_index=query_index + 1))
+
+    if reset and os.path.exists(pre_search_snapshot()):
+        shutil.rmtree(pre_search_snapshot())
+    add_action("search_end")
+
+def search_query(search_query):
+    """Search for one query; its actions carry the query."""
     max_search_results = args.get('maxSearchResults', 10)
     max_recommendations = args.get('maxRecommendations', 10)
     
@@ -222,13 +449,14 @@ def search():
     
     # Perform search
     driver = puppet['driver']
-    search_results = driver.search_videos(search_query, scroll_times=2)
+    # Scrolls only until max_search_results unique results are loaded
+    search_results = driver.search_videos(search_query, max_results=max_search_results)
     
     if search_results:
         print(f"Found {len(search_results)} search results")
         # Use configurable max_search_results instead of hardcoded 10
         limited_results = search_results[:max_search_results]
-        add_action("search_results", [vid.videoId for vid in limited_results])
+        add_action("search_results", [vid.videoId for vid in limited_results], query=search_query)
         
         # Watch first search result to trigger recommendations
         first_video = search_results[0]
@@ -239,14 +467,67 @@ def search():
         recommendations = get_recommendations()
         if recommendations:
             recommendation_ids = [vid.videoId for vid in recommendations[:max_recommendations]]
-            add_action("search_recommendations", recommendation_ids)
+            add_action("search_recommendations", recommendation_ids, query=search_query)
             print(f"Collected {len(recommendation_ids)} recommendations after search")
         else:
             print("No recommendations found after search")
     else:
         print(f"No search results found for '{search_query}'")
-    
-    add_action("search_end")
+
+def crawl_seeds(count):
+    """Videos the crawl starts from: crawlSeeds, else the top search results, else testSeed."""
+    if args.get('crawlSeeds'):
+        return list(args['crawlSeeds'])
+    search_results = [a['params'] for a in puppet['actions'] if a['action'] == 'search_results']
+    if search_results:
+        return search_results[-1][:count]
+    return [args['testSeed']]
+
+def crawl():
+    """
+    Explore the up-next recommendation graph breadth first: watch each video and
+    follow its top `crawlBranching` recommendations down to `crawlDepth` hops from
+    the seeds, never expanding a video twice, until `crawlBudget` videos were watched.
+    Each hop is logged as a 'crawl_hop' action (see recommendation_graph).
+    """
+    max_depth = int(args.get('crawlDepth', 3))
+    branching = int(args.get('crawlBranching', 3))
+    budget = int(args.get('crawlBudget', 20))
+    duration = args.get('crawlWatchDuration', 10)
+
+    progress = step_progress()
+    if progress:
+        queue = deque(tuple(node) for node in progress['queue'])
+        visited = set(progress['visited'])
+        watched = progress['watched']
+    else:
+        seeds = list(dict.fromkeys(crawl_seeds(branching)))
+        add_action('crawl_start', dict(seeds=seeds, depth=max_depth, branching=branching, budget=budget))
+        queue = deque((video_id, 0) for video_id in seeds)
+        visited = set(seeds)
+        watched = 0
+
+    driver = puppet['driver']
+    while queue and watched < budget:
+        video_id, depth = queue.popleft()
+        try:
+            watch(Video(None, make_url(video_id)), duration)
+            watched += 1
+            recommendations = [video.videoId for video in driver.get_upnext_recommendations(topn=branching)[:branching]]
+        except Exception as e:
+            print(f"Crawl: error on video {video_id}: {e}")
+            recommendations = []
+        add_action('crawl_hop', recommendations, source=video_id, depth=depth)
+        for target in recommendations:
+            if target not in visited:
+                visited.add(target)
+                # Videos at the maximum depth are recorded as edges but not watched
+                if depth + 1 < max_depth:
+                    queue.append((target, depth + 1))
+        save_checkpoint(progress=dict(queue=list(queue), visited=sorted(visited), watched=watched))
+
+    add_action('crawl_end', dict(watched=watched, videos=len(visited)))
+    print(f"Crawl completed: {watched} videos watched, {len(visited)} videos reached")
 
 def intervention():
     get_homepage()
@@ -258,39 +539,214 @@ def intervention():
     add_action("intervention_end")
 
 
-if __name__ == '__main__':
-    args = parse_args()
+def snapshot(remaining_steps):
+    """Save the trained profile so search puppets can start from it (see profile_snapshot)."""
+    snapshot_dir = os.path.join(makedir(args['outputDir'], 'snapshots'), args['puppetId'])
+    # Chrome must be closed for its profile files to be consistent
+    puppet['driver'].quit()
+    snapshot_profile(puppet['profile_dir'], snapshot_dir)
+    add_action('snapshot', snapshot_dir)
+    print(f"Profile snapshot saved to {snapshot_dir}")
+    if remaining_steps:
+        relaunch_driver()
+
+def relaunch_driver():
+    """Start a new browser on the puppet's profile after quitting it, keeping the timings collected so far."""
+    startup_seconds = puppet['driver'].startup_seconds
+    step_timings = puppet['driver'].step_timings
+    page_loads = puppet['driver'].page_loads
+    puppet['driver'] = launch_driver(puppet['profile_dir'], virtual_display=False)
+    configure_driver(puppet['driver'])
+    puppet['driver'].step_timings = step_timings + puppet['driver'].step_timings
+    puppet['driver'].page_loads = page_loads + puppet['driver'].page_loads
+    puppet['driver'].startup_seconds = startup_seconds
+
+def run_steps():
+    steps = args['steps'].split(',')
+    if args.get('baseSnapshot') and puppet['checkpoint']['step_index'] == 0:
+        add_action('from_snapshot', args['baseSnapshot'])
+    for i, action in enumerate(steps):
+        # Completed before an interruption
+        if i < puppet['checkpoint']['step_index']:
+            continue
+        if action == 'train':
+            train()
+        elif action == 'train_channels':
+            # Train from channels CSV file
+            channels_file = args.get('channelsFile', 'data/chaines_clean.csv')
+            max_channels = args.get('maxChannels', None)
+            videos_per_channel = args.get('videosPerChannel', 3)
+            ideology_filter = args.get('ideologyFilter', None)
+            train_from_channels(channels_file, max_channels, videos_per_channel, ideology_filter)
+        elif action == 'test':
+            test()
+        elif action == 'search':
+            search()
+        elif action == 'intervention':
+            intervention()
+        elif action == 'crawl':
+            crawl()
+        elif action == 'snapshot':
+            snapshot(steps[i + 1:])
+        save_checkpoint(step_index=i + 1, progress={})
 
+def run_puppet(puppet_args, driver=None):
+    """
+    Conduct one end-to-end experiment.
+
+    When `driver` is given (leased from a BrowserPool) the caller owns it and
+    is responsible for releasing it; otherwise the puppet's own browser is closed.
+    """
+    global args
+    args = puppet_args
+
+    # Metadata fetched through Video.get_metadata is shared with other runs and the analysis
+    if args.get('metadataCache'):
+        Video.METADATA_CACHE = MetadataCache(args['metadataCache'])
+
+    # Actions are streamed here as they happen; see action_log.reconstruct_puppet
+    log = ActionLog(os.path.join(makedir(args['outputDir'], 'actions'), f"{args['puppetId']}.jsonl"))
+    log.write('start', flush=True, puppet_id=args['puppetId'], args=args)
     try:
-        # conduct end-to-end experiment
         profile_dir = os.path.join(makedir(args['outputDir'], 'profiles'), args['puppetId'])
-        init_puppet(args['puppetId'], profile_dir)
-
-        for action in args['steps'].split(','):
-            if action == 'train':
-                train()
-            elif action == 'train_channels':
-                # Train from channels CSV file
-                channels_file = args.get('channelsFile', 'data/chaines_clean.csv')
-                max_channels = args.get('maxChannels', None)
-                videos_per_channel = args.get('videosPerChannel', 3)
-                ideology_filter = args.get('ideologyFilter', None)
-                train_from_channels(channels_file, max_channels, videos_per_channel, ideology_filter)
-            elif action == 'test':
-                test()
-            elif action == 'search':
-                search()
-            elif action == 'intervention':
-                intervention()
+        init_puppet(args['puppetId'], profile_dir, driver)
+        puppet['log'] = log
+        checkpoint = load_checkpoint()
+        if checkpoint:
+            print(f"Resuming from checkpoint: step {checkpoint['step_index']}, progress {checkpoint['progress']}")
+            restore_from_checkpoint(checkpoint)
+        else:
+            puppet['checkpoint'] = dict(step_index=0, progress={}, start_time=puppet['start_time'])
+
+        run_steps()
     
         # finalize puppet
-        puppet['driver'].close()
+        if puppet['owns_driver'] and needs_persistent_profile():
+            # Quit so the profile is fully written (and reusable) before the container exits
+            puppet['driver'].quit()
+        elif puppet['owns_driver']:
+            puppet['driver'].close()
         puppet['steps'] = args['steps']
         puppet['duration'] = args['duration']
         puppet['description'] = args['description']
         save_puppet()
+        if os.path.exists(checkpoint_path()):
+            os.remove(checkpoint_path())
     except Exception as e:
         exception = dict(time=datetime.now(), exception=str(e), module='sock-puppet')
         print(exception)
+        log.write('exception', exception=str(e))
         with open(os.path.join(makedir(args['outputDir'], 'exceptions'), args['puppetId']), 'w') as f:
-            json.dump(exception, f, default=str)
\ No newline at end of file
+            json.dump(exception, f, default=str)
+    finally:
+        log.close()
+        if Video.METADATA_CACHE is not None:
+            # One connection per puppet: pooled and worker runs would leak them otherwise
+            Video.METADATA_CACHE.close()
+            Video.METADATA_CACHE = None
+
+def run_with_pool(argument_files, pool_size=None):
+    """
+    Run several puppets back to back, launching the next browser while the current puppet runs.
+
+    Puppets needing a persistent profile launch their own browser on it, so no
+    pooled browser is leased (it would sit idle next to theirs); the pool is
+    only started once a puppet can use it.
+    """
+    from browser_pool import BrowserPool
+
+    if pool_size is None:
+        pool_size = min(2, len(argument_files))
+    pool = None
+    try:
+        for path in argument_files:
+            puppet_args = parse_args(path)
+            if needs_persistent_profile(puppet_args):
+                run_puppet(puppet_args)
+                continue
+            if pool is None:
+                pool = BrowserPool(size=pool_size, headless=use_headless(),
+                                   use_virtual_display=use_virtual_display(), verbose=True)
+            with pool.leased() as driver:
+                run_puppet(puppet_args, driver)
+    finally:
+        if pool:
+            print(f"Browser pool stats: {pool.stats()}")
+            pool.close()
+
+def container_memory_limit_mb():
+    """Memory limit of the current cgroup (i.e. the container), or None if unlimited/unknown."""
+    for path in ['/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes']:
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # cgroup v1 reports "unlimited" as a huge number, v2 as "max"
+        if value.isdigit() and int(value) < 1 << 50:
+            return int(value) // (1024 * 1024)
+    return None
+
+def workers_for_budget(num_puppets, memory_budget_mb=None, puppet_memory_mb=DEFAULT_PUPPET_MEMORY_MB):
+    """Number of puppets that can run concurrently within the memory budget (with each worker's spare browsers)."""
+    if memory_budget_mb is None:
+        memory_budget_mb = container_memory_limit_mb()
+    if memory_budget_mb is None:
+        workers = os.cpu_count() or 1
+    else:
+        workers = memory_budget_mb // (puppet_memory_mb + (WORKER_POOL_SIZE - 1) * SPARE_BROWSER_MEMORY_MB)
+    return max(1, min(num_puppets, workers))
+
+def worker(paths):
+    """Worker process: run puppets from the shared queue until the None sentinel, one at a time."""
+    # A pool of one would make every lease wait for the replacement's cold start
+    run_with_pool(iter(paths.get, None), pool_size=WORKER_POOL_SIZE)
+
+def run_workers(argument_files, num_workers):
+    """Run the puppets with `num_workers` concurrent worker processes (each with a warm spare Chrome) sharing one display."""
+    display = None
+    if use_virtual_display():
+        try:
+            from pyvirtualdisplay import Display
+            display = Display(size=(1920, 1080))
+            display.start()
+            os.environ['EYT_SHARED_DISPLAY'] = '1'
+        except ImportError:
+            print("pyvirtualdisplay not available")
+
+    paths = multiprocessing.Queue()
+    for path in argument_files:
+        paths.put(path)
+    for _ in range(num_workers):
+        paths.put(None)
+
+    print(f"Running {len(argument_files)} puppets with {num_workers} workers")
+    workers = [multiprocessing.Process(target=worker, args=(paths,)) for _ in range(num_workers)]
+    try:
+        for p in workers:
+            p.start()
+        for p in workers:
+            p.join()
+    finally:
+        if display:
+            display.stop()
+
+def parse_cli():
+    parser = ArgumentParser(description='Run one or more sockpuppets')
+    parser.add_argument('argument_files', nargs='+', help='Puppet argument JSON files')
+    parser.add_argument('--workers', type=int, default=None, help='Number of puppets to run concurrently (default: from the memory budget)')
+    parser.add_argument('--memory-budget', type=int, default=None, help='Memory budget in MB for all puppets (default: container memory limit)')
+    parser.add_argument('--puppet-memory', type=int, default=DEFAULT_PUPPET_MEMORY_MB, help='Estimated memory in MB used by one puppet')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    cli = parse_cli()
+    if len(cli.argument_files) == 1:
+        run_puppet(parse_args(cli.argument_files[0]))
+    else:
+        num_workers = cli.workers or workers_for_budget(len(cli.argument_files), cli.memory_budget, cli.puppet_memory)
+        if num_workers > 1:
+            run_workers(cli.argument_files, num_workers)
+        else:
+            run_with_pool(cli.argument_files)
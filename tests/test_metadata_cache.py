@@ -0,0 +1,48 @@
+from EYTDriver import Video
+from metadata_cache import MetadataCache
+from metadata_enrichment import enrich
+
+
+class StubExtractor:
+    """video_id -> info dict, counting calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, video_id):
+        self.calls.append(video_id)
+        return dict(id=video_id, title=f'Title {video_id}')
+
+    def extract_info(self, url, download=False):
+        return self(url.rsplit('=', 1)[-1])
+
+
+def test_enrich_fills_new_cache_and_hits_it(tmp_path):
+    cache = MetadataCache(str(tmp_path / 'cache.sqlite'))
+    extractor = StubExtractor()
+    try:
+        metadata, failures = enrich(['aaaaaaaaaaa', 'bbbbbbbbbbb'], extractor=extractor, workers=2, cache=cache)
+        assert not failures
+        assert cache.count() == 2
+
+        metadata, failures = enrich(['aaaaaaaaaaa', 'bbbbbbbbbbb'], extractor=extractor, workers=2, cache=cache)
+        assert len(extractor.calls) == 2
+        assert metadata['aaaaaaaaaaa'].title == 'Title aaaaaaaaaaa'
+    finally:
+        cache.close()
+
+
+def test_video_metadata_fills_new_cache_and_hits_it(tmp_path, monkeypatch):
+    cache = MetadataCache(str(tmp_path / 'cache.sqlite'))
+    extractor = StubExtractor()
+    monkeypatch.setattr(Video, 'YT_DLP', extractor)
+    monkeypatch.setattr(Video, 'METADATA_CACHE', cache)
+    try:
+        url = 'https://www.youtube.com/watch?v=ccccccccccc'
+        assert Video(None, url).get_metadata().title == 'Title ccccccccccc'
+        assert cache.count() == 1
+
+        assert Video(None, url).get_metadata().title == 'Title ccccccccccc'
+        assert extractor.calls == ['ccccccccccc']
+    finally:
+        cache.close()
@@ -0,0 +1,30 @@
+import pytest
+
+from metadata_enrichment import PermanentExtractionError, extract_with_retry
+
+
+class FailingExtractor:
+    """Raises the given errors in turn, then returns an info dict."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self, video_id):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return dict(id=video_id)
+
+
+def test_transient_error_is_retried():
+    extractor = FailingExtractor(Exception('ERROR: [youtube] aaaaaaaaaaa: HTTP Error 503: Service Unavailable'))
+    assert extract_with_retry(extractor, 'aaaaaaaaaaa', retries=2, backoff=0) == dict(id='aaaaaaaaaaa')
+    assert extractor.calls == 2
+
+
+def test_permanent_error_is_not_retried():
+    extractor = FailingExtractor(Exception('ERROR: [youtube] aaaaaaaaaaa: Video unavailable'))
+    with pytest.raises(PermanentExtractionError):
+        extract_with_retry(extractor, 'aaaaaaaaaaa', retries=2, backoff=0)
+    assert extractor.calls == 1